@@ -0,0 +1,197 @@
+"""
+ASGI webhook entry point (Starlette), alternative to flask_app.py.
+
+Serves the same /, /webhook and /set_webhook routes, but every update runs on
+the server's own event loop, so one process can hold hundreds of in-flight
+updates. Run with:  uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+from services.startup import startup, prewarm, import_modules
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from config import Config
+from services.update_dispatcher import UpdateDispatcher
+from services.metrics import metrics
+from services.update_dedup import update_dedup
+# telegram / handlers are imported in initialize_bot (off the critical path with FAST_STARTUP)
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Global instances
+bot_app = None
+startup_task = None  # background initialization (FAST_STARTUP)
+report_task = None
+dispatcher = UpdateDispatcher(Config.WEBHOOK_QUEUE_SIZE, Config.WEBHOOK_CONCURRENCY)
+metrics.register_gauge('webhook_queue', 'Webhook queue depth and counters', dispatcher.get_stats)
+
+async def initialize_bot():
+    """Build and initialize the bot Application for webhook mode"""
+    global bot_app
+    
+    try:
+        with startup.phase('handlers_import'):
+            await import_modules('handlers.registry', 'services.telegram_client')
+        from handlers.registry import register_handlers
+        from services.telegram_client import application_builder
+        
+        Config.validate()
+        
+        def build_application():
+            application = application_builder().build()
+            register_handlers(application)
+            return application
+        
+        with startup.phase('application_build'):
+            application = await asyncio.to_thread(build_application)
+        
+        with startup.phase('bot_initialize'):
+            await application.initialize()
+        bot_app = application
+        startup.mark('bot_ready')
+        logger.info("✅ Bot initialized successfully (ASGI)")
+        return bot_app
+    
+    except Exception as e:
+        logger.error(f"❌ Initialization Error: {e}")
+        bot_app = None
+        return None
+
+async def start_bot():
+    """Initialize the bot, start the activity reports and prewarm Groq"""
+    global report_task
+    from services.logger import LoggerService
+    if await initialize_bot() is not None:
+        report_task = asyncio.create_task(LoggerService.periodic_report_task(bot_app.bot))
+    asyncio.create_task(prewarm())
+
+async def wait_for_startup():
+    """Wait for background initialization to finish (FAST_STARTUP)"""
+    if bot_app is None and startup_task is not None and not startup_task.done():
+        with metrics.timer('startup_wait'):
+            try:
+                await asyncio.wait_for(asyncio.shield(startup_task), Config.STARTUP_WAIT_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"⚠️ Still starting after {Config.STARTUP_WAIT_TIMEOUT}s: {e!r}")
+
+@asynccontextmanager
+async def lifespan(app):
+    global startup_task
+    dispatcher.bind(asyncio.get_running_loop())
+    startup.mark('imports')
+    if Config.FAST_STARTUP:
+        # Serve immediately; the first webhook call waits for the bot if it is not ready yet
+        startup_task = asyncio.create_task(start_bot())
+    else:
+        await start_bot()
+    startup.mark('serving')
+    yield
+    await shutdown_bot()
+
+async def shutdown_bot():
+    """Finish acknowledged updates, then flush the log group sink and storage (same order as bot.py)"""
+    if startup_task is not None:
+        startup_task.cancel()
+    left = await dispatcher.drain(Config.WEBHOOK_DRAIN_TIMEOUT)
+    if left:
+        logger.warning(f"⚠️ {left} acknowledged updates left unprocessed after {Config.WEBHOOK_DRAIN_TIMEOUT}s")
+    from services.chat_gate import chat_gate
+    running = await chat_gate.drain(Config.WEBHOOK_DRAIN_TIMEOUT)  # debounced turns run detached from the queue
+    if running:
+        logger.warning(f"⚠️ {running} AI turns still running after {Config.WEBHOOK_DRAIN_TIMEOUT}s")
+    if report_task is not None:
+        report_task.cancel()
+    if bot_app is not None:
+        from services.log_sink import log_sink
+        await log_sink.flush()
+        await bot_app.shutdown()
+    from services.storage import storage
+    storage.close()
+    logger.info("👋 Bot stopped")
+
+async def index(request: Request):
+    starting = startup_task is not None and not startup_task.done()
+    status = "✅ ACTIVE" if bot_app else ("⏳ STARTING" if starting else "❌ FAILED")
+    token_val = Config.TELEGRAM_BOT_TOKEN or "MISSING"
+    kh_time = datetime.now(ZoneInfo('Asia/Phnom_Penh')).strftime('%Y-%m-%d %H:%M:%S')
+    return HTMLResponse(f"🤖 Bot Status: {status}<br>Time: {kh_time}<br>Token Prefix: {token_val[:8]}...")
+
+async def webhook(request: Request):
+    """Enqueue a Telegram update and acknowledge immediately"""
+    await wait_for_startup()
+    if bot_app is None:
+        logger.warning("⚠️ Bot was None at webhook call. Attempting emergency re-init...")
+        if await initialize_bot() is None:
+            return PlainTextResponse("Bot Initialization Failed", status_code=500)
+    
+    update_id = None
+    try:
+        from telegram import Update
+        from services.update_filter import parse_update, should_process
+        
+        body = await request.body()
+        with metrics.timer('webhook_parse'):
+            update_data = parse_update(body)
+        update_id = update_data.get('update_id')
+        if not update_dedup.accept(update_id):
+            logger.info(f"🔁 Dropped redelivered update {update_id}")
+            return PlainTextResponse("OK")
+        if not should_process(update_data):
+            return PlainTextResponse("OK")
+        with metrics.timer('de_json'):
+            update = Update.de_json(update_data, bot_app.bot)
+        
+        chat_key = update.effective_chat.id if update.effective_chat else update.update_id
+        app_ref = bot_app
+        if not dispatcher.submit(chat_key, lambda: app_ref.process_update(update)):
+            logger.warning(f"⚠️ Update queue full ({dispatcher.max_pending}), asking Telegram to retry")
+            update_dedup.forget(update_id)
+            return PlainTextResponse("Busy", status_code=503)
+        return PlainTextResponse("OK")
+    except Exception as e:
+        logger.error(f"❌ Webhook Error: {e}")
+        if update_id is not None:
+            update_dedup.forget(update_id)
+        return PlainTextResponse("Error", status_code=500)
+
+async def set_webhook(request: Request):
+    """Point Telegram at Config.WEBHOOK_URL"""
+    await wait_for_startup()
+    if bot_app is None:
+        return PlainTextResponse("❌ Error: bot not initialized")
+    try:
+        url = Config.WEBHOOK_URL
+        await bot_app.bot.delete_webhook(drop_pending_updates=True)
+        success = await bot_app.bot.set_webhook(url=url)
+        return PlainTextResponse(f"✅ Webhook set to {url}. Success: {success}")
+    except Exception as e:
+        logger.error(f"❌ Set Webhook Error: {e}")
+        return PlainTextResponse(f"❌ Error: {e}")
+
+async def queue_stats(request: Request):
+    """Webhook queue depth and backpressure counters"""
+    return JSONResponse(dispatcher.get_stats())
+
+async def prometheus_metrics(request: Request):
+    """Per-stage latency histograms and counters (Prometheus text format)"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/webhook', webhook, methods=['POST']),
+        Route('/set_webhook', set_webhook),
+        Route('/queue_stats', queue_stats),
+        Route('/metrics', prometheus_metrics),
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,72 @@
+"""
+Completions/sec with N simulated concurrent chats against a local fake Groq server.
+
+Compares the old blocking `Groq` client (called inside the coroutine, as
+handle_message used to) with the pooled `AsyncGroq` client from get_groq_client().
+
+Run from the repo root:  python -m benchmarks.bench_groq_concurrency --chats 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault('GROQ_API_KEY', 'fake-key')
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123:fake')
+
+from benchmarks.fake_groq import FakeGroq
+
+
+async def run_chats(create, chats, rounds):
+    """Simulate `chats` chats each sending `rounds` messages sequentially"""
+    async def chat(chat_id):
+        for i in range(rounds):
+            await create(messages=[{'role': 'user', 'content': f"chat {chat_id} message {i}"}])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(c) for c in range(chats)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    server = FakeGroq(latency=args.latency).serve_in_thread()
+
+    from config import Config
+    Config.GROQ_BASE_URL = server.url
+    from handlers import messages
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    async_client = messages.get_groq_client()
+
+    from groq import Groq
+    import httpx
+    sync_client = Groq(api_key=Config.GROQ_API_KEY, base_url=server.url, http_client=httpx.Client())
+
+    total = args.chats * args.rounds
+    print(f"📊 {args.chats} chats x {args.rounds} messages, server latency {args.latency}s\n")
+
+    async def blocking_create(**kwargs):
+        # What handle_message did before: a sync call inside the coroutine
+        return sync_client.chat.completions.create(model=Config.GROQ_MODEL, **kwargs)
+
+    if not args.skip_sync:
+        elapsed = await run_chats(blocking_create, args.chats, args.rounds)
+        print(f"🐢 sync Groq:  {total / elapsed:8.1f} completions/sec ({elapsed:.2f}s)")
+
+    async def async_create(**kwargs):
+        return await async_client.chat.completions.create(model=Config.GROQ_MODEL, **kwargs)
+
+    elapsed = await run_chats(async_create, args.chats, args.rounds)
+    print(f"🚀 AsyncGroq:  {total / elapsed:8.1f} completions/sec ({elapsed:.2f}s)")
+
+    await async_client.close()
+    sync_client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--skip-sync', action='store_true', help='only run the async client')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,267 @@
+"""
+MarkdownV2 formatting: previous 18-pass escaper vs the single-pass formatter,
+plus a corpus check that every formatted reply is valid MarkdownV2 and that
+replies over Telegram's limit split into valid chunks that fit one message.
+
+Run from the repo root:  python -m benchmarks.bench_markdown
+Check against the real Bot API as well (sends one message per sample):
+    python -m benchmarks.bench_markdown --live-chat <chat_id>
+Exits non-zero if any sample fails.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from services.markdown_v2 import to_markdown_v2
+from services.reply_splitter import TELEGRAM_TEXT_LIMIT, split_reply
+
+CORPUS = [
+    "Hello! How can I help you today?",
+    "ជំរាបសួរ! ខ្ញុំអាចជួយអ្វីបានខ្លះ? (Khmer with punctuation.)",
+    "Use **bold**, *italic*, __also bold__, _also italic_ and ~~strike~~.",
+    "Call `my_function(x=1)` then check `a*b+c`.",
+    "Here is code:\n```python\ndef add(a, b):\n    return a + b  # sum *args_here*\n```\nDone.",
+    "Unclosed fence from a truncated reply:\n```js\nconst x = `template ${y}`;\nconsole.log(x",
+    "Fence without newline ```print('hi')``` inline.",
+    "Path C:\\Users\\me\\file.txt and a trailing backslash \\",
+    "```\nbackslash at end \\\n```",
+    "```\nends with backslash\\```",
+    "See [the docs](https://example.com/a_b/c-d?x=1&y=2#frag) for details.",
+    "[link with **bold** text](https://example.com) and [broken link](not closed",
+    "A URL with parens https://en.wikipedia.org/wiki/Python_(programming_language).",
+    "snake_case_name and __dunder__ and file_name.py",
+    "Math: 2*3*4 = 24, 5 - 3 = 2, 1 + 1 = 2, a_1 + a_2, x^2 {set} |pipe| #hash! done.",
+    "# Heading\n## Sub *heading*\nText under heading.",
+    "- item one\n- item **two**\n  - nested item\n* star item\n+ plus item",
+    "1. First step.\n2. Second step (optional).\n3. Third!",
+    "> quoted line\nnot quoted > inline",
+    "| col1 | col2 |\n|------|------|\n| a_b  | c*d  |",
+    "**bold with `code` inside** and *italic with **bold** inside*",
+    "_italic with *nested italic* inside_",
+    "***triple stars*** and **unbalanced bold",
+    "*a**b* and _a__b_ and **x**_y_",
+    "Emoji 🚀✨ with symbols ~ ` > # + - = | { } . !",
+    "Stars alone * and underscores alone _ and backticks ` alone",
+    "`unclosed inline code and **bold**",
+    "Inline `code with \\ backslash` and `back`tick",
+    "Line one\n\n\nLine after blank lines.",
+    "~~**bold strike**~~ and **~~strike bold~~**",
+    "Mixed: **Price:** $5.99 (was $7.99) - save 25%!",
+    "Email me at user_name@example.com or visit www.example.com.",
+    "[**bold link**](https://t.me/some_bot) [`code link`](https://x.y/z)",
+    "Nested link [a [b] c](https://example.com)",
+    "```bash\necho \"hello\" | grep -E '[a-z]+' > out.txt\n```\n```\nsecond block\n```",
+]
+
+RESERVED = set('_*[]()~`>#+-=|{}.!')
+
+
+def validate_markdown_v2(text: str):
+    """Strict re-implementation of Telegram's MarkdownV2 rules; returns an error string or None"""
+    stack = []  # open entities: bold, italic, underline, strike, spoiler, link
+    i, n = 0, len(text)
+    line_start = True
+    while i < n:
+        char = text[i]
+        if char == '\\':
+            if i + 1 >= n or not 1 <= ord(text[i + 1]) <= 126:
+                return f"bad escape at {i}"
+            i += 2
+            line_start = False
+            continue
+        if char == '`':
+            if stack:
+                return f"code inside {stack[-1]} at {i}"
+            pre = text.startswith('```', i)
+            j = i + (3 if pre else 1)
+            while j < n:
+                if text[j] == '\\':
+                    j += 2
+                    continue
+                if text[j] == '`':
+                    if not pre:
+                        break
+                    if text.startswith('```', j):
+                        break
+                    return f"unescaped ` inside pre at {j}"
+                if not pre and text[j] == '\n':
+                    pass
+                j += 1
+            else:
+                return f"unterminated {'pre' if pre else 'code'} from {i}"
+            i = j + (3 if pre else 1)
+            line_start = False
+            continue
+        if char == '>' and line_start:
+            i += 1
+            line_start = False
+            continue
+        entity = None
+        width = 1
+        if char == '*':
+            entity = 'bold'
+        elif char == '_':
+            if text.startswith('__', i):
+                entity, width = 'underline', 2
+            else:
+                entity = 'italic'
+        elif char == '~':
+            entity = 'strike'
+        elif char == '|':
+            if not text.startswith('||', i):
+                return f"reserved '|' at {i}"
+            entity, width = 'spoiler', 2
+        elif char == '[':
+            if 'link' in stack:
+                return f"link inside link at {i}"
+            stack.append('link')
+            i += 1
+            line_start = False
+            continue
+        elif char == ']':
+            if not stack or stack[-1] != 'link':
+                return f"unmatched ] at {i}"
+            if not text.startswith('(', i + 1):
+                return f"link without url at {i}"
+            j = i + 2
+            while j < n and text[j] != ')':
+                j += 2 if text[j] == '\\' else 1
+            if j >= n:
+                return f"unterminated url from {i}"
+            stack.pop()
+            i = j + 1
+            line_start = False
+            continue
+        elif char in RESERVED:
+            return f"reserved {char!r} at {i}"
+
+        if entity is not None:
+            if entity in stack:
+                if stack[-1] != entity:
+                    return f"improperly nested {entity} at {i}"
+                stack.pop()
+            else:
+                stack.append(entity)
+            i += width
+            line_start = False
+            continue
+
+        line_start = char == '\n'
+        i += 1
+    if stack:
+        return f"unclosed {stack[-1]}"
+    return None
+
+
+def legacy_format(text: str) -> str:
+    # Previous format_message_for_telegram: split on ``` + 18 str.replace passes
+    def escape(part):
+        for char in ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']:
+            part = part.replace(char, f'\\{char}')
+        return part
+    if '```' in text:
+        parts = text.split('```')
+        for i in range(0, len(parts), 2):
+            parts[i] = escape(parts[i])
+        return '```'.join(parts)
+    return escape(text)
+
+
+def long_replies():
+    """Replies over the limit: the corpus repeated, a huge code block, one endless paragraph"""
+    code = "```python\n" + "\n".join(f"value_{i} = `{i}` * 2  # \\ step {i}" for i in range(400)) + "\n```"
+    return [
+        "\n\n".join(CORPUS * 4),
+        "Here is the script:\n\n" + code + "\n\nRun it with **python**.",
+        " ".join(["**Step**: call `run()` then see [docs](https://example.com/a_b)."] * 200),
+        "x_" * 5000,
+    ]
+
+
+def check_split(samples):
+    """Number of invalid or oversized chunks"""
+    failures = 0
+    for sample in samples:
+        chunks = split_reply(sample)
+        for formatted, _ in chunks:
+            error = validate_markdown_v2(formatted)
+            if error or len(formatted) > TELEGRAM_TEXT_LIMIT:
+                failures += 1
+                print(f"  ❌ chunk of {sample[:30]!r} ({len(formatted)} chars): {error or 'too long'}")
+        print(f"✂️ {len(sample):6} chars -> {len(chunks)} messages")
+    return failures
+
+
+def bench(fn, samples, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for sample in samples:
+            fn(sample)
+    return (time.perf_counter() - start) / (repeat * len(samples))
+
+
+async def check_live(chat_id, samples):
+    from telegram import Bot
+    from telegram.error import BadRequest, RetryAfter
+    from config import Config
+
+    failures = 0
+    async with Bot(Config.TELEGRAM_BOT_TOKEN, base_url=Config.TELEGRAM_API_BASE_URL) as bot:
+        for sample in samples:
+            while True:
+                try:
+                    await bot.send_message(chat_id, to_markdown_v2(sample), parse_mode='MarkdownV2')
+                    break
+                except RetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except BadRequest as e:
+                    failures += 1
+                    print(f"  ❌ Telegram rejected {sample[:40]!r}: {e}")
+                    break
+            await asyncio.sleep(1)  # stay under the per-chat limit
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--live-chat', help='also send every sample to this chat through the Bot API')
+    args = parser.parse_args()
+
+    failures = 0
+    legacy_failures = 0
+    for sample in CORPUS:
+        error = validate_markdown_v2(to_markdown_v2(sample))
+        if error:
+            failures += 1
+            print(f"  ❌ {sample[:50]!r}: {error}\n     -> {to_markdown_v2(sample)!r}")
+        if validate_markdown_v2(legacy_format(sample)):
+            legacy_failures += 1
+    print(f"📚 Corpus: {len(CORPUS)} samples, {failures} invalid (previous formatter: {legacy_failures} invalid)")
+
+    # Typical reply sizes: the corpus joined into ~2-3 KB answers
+    long_samples = ['\n\n'.join(CORPUS[i:] + CORPUS[:i]) for i in range(0, len(CORPUS), 5)]
+    for name, samples, repeat in (('short', CORPUS, args.repeat), ('long', long_samples, max(1, args.repeat // 10))):
+        old = bench(legacy_format, samples, repeat)
+        new = bench(to_markdown_v2, samples, repeat)
+        print(f"⏱ {name:5} replies: previous {old * 1e6:8.1f} µs   single-pass {new * 1e6:8.1f} µs   ({old / new:.2f}x)")
+
+    split_samples = long_replies()
+    failures += check_split(split_samples)
+    split = bench(split_reply, split_samples, max(1, args.repeat // 100))
+    print(f"⏱ split long replies: {split * 1e3:.2f} ms per reply")
+
+    if args.live_chat:
+        live_failures = asyncio.run(check_live(args.live_chat, CORPUS))
+        print(f"📡 Bot API: {len(CORPUS) - live_failures}/{len(CORPUS)} accepted")
+        failures += live_failures
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Banned-word moderation: old per-word substring scan vs the compiled engine.
+
+Run from the repo root:  python -m benchmarks.bench_moderation --words 10000
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from services.moderation import ModerationEngine
+
+LATIN = 'abcdefghijklmnopqrstuvwxyz'
+KHMER = [chr(c) for c in range(0x1780, 0x17B4)]  # consonants and independent vowels
+
+
+def random_word(rng):
+    alphabet = KHMER if rng.random() < 0.5 else LATIN
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 10)))
+
+
+def random_message(rng, length):
+    parts = []
+    size = 0
+    while size < length:
+        word = random_word(rng)
+        parts.append(word)
+        size += len(word) + 1
+    return ' '.join(parts)[:length]
+
+
+def naive_check(words, message):
+    # Previous BotService.moderate_message: lower() per word + substring scan
+    for word in words:
+        if word and word in message.lower():
+            return word
+    return None
+
+
+def bench(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--words', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = [random_word(rng) for _ in range(args.words)]
+
+    start = time.perf_counter()
+    engine = ModerationEngine(words=words, word_boundary=False).reload()
+    print(f"🛡 {args.words} banned words, compiled in {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+    for length in (50, 300, 1000, 4000):
+        messages = [random_message(rng, length) for _ in range(args.messages)]
+        naive = bench(lambda m: naive_check(words, m), messages, args.repeat)
+        compiled = bench(engine.find, messages, args.repeat)
+        print(f"{length:>5} chars: naive {naive * 1e6:10.1f} µs/msg | compiled {compiled * 1e6:8.1f} µs/msg | "
+              f"{naive / compiled:6.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
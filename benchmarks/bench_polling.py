@@ -0,0 +1,105 @@
+"""
+Polling throughput benchmark: bot.py against the local fake Bot API.
+
+For each POLLING_CONCURRENCY value a fresh bot.py process starts with
+`--updates` private-chat messages already waiting (a restart backlog) and
+the time from its first getUpdates call to the last AI reply gives
+updates/sec. Then another batch is pushed, SIGTERM is sent while replies are
+still going out, and every update the bot confirmed is checked for a reply
+(graceful shutdown must not lose any).
+
+Run from the repo root:  python -m benchmarks.bench_polling --updates 300 --concurrency 1,8,32
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_groq import FakeGroq
+from benchmarks.fake_telegram import FakeTelegram
+from benchmarks.loadtest_webhook import ROOT, make_update
+
+
+def wait_for(condition, timeout, what):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"timed out waiting for {what}")
+        time.sleep(0.005)
+    return time.perf_counter()
+
+
+def replied(telegram, chats):
+    return sum(1 for chat, _ in telegram.sent if chat in chats)
+
+
+def run_once(concurrency, args, env):
+    telegram = FakeTelegram(latency=args.api_latency)
+    server = telegram.serve_in_thread()
+    run_env = dict(env, POLLING_CONCURRENCY=str(concurrency), TELEGRAM_API_BASE_URL=f"{server.url}/bot")
+
+    # Backlog waiting before the bot starts, one chat per update
+    backlog = {}
+    for update_id in range(1, args.updates + 1):
+        chat_id = 10_000 + update_id
+        backlog[update_id] = chat_id
+        telegram.push_update(make_update(update_id, chat_id))
+
+    proc = subprocess.Popen([sys.executable, 'bot.py'], cwd=ROOT, env=run_env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        started = wait_for(lambda: telegram.calls.get('getUpdates'), 60, "first getUpdates")
+        chats = set(backlog.values())
+        finished = wait_for(lambda: replied(telegram, chats) >= len(chats), 300, "backlog replies")
+        rate = args.updates / (finished - started)
+
+        # Graceful shutdown with replies in flight
+        batch = {}
+        for update_id in range(args.updates + 1, args.updates + args.shutdown_updates + 1):
+            batch[update_id] = 20_000 + update_id
+            telegram.push_update(make_update(update_id, batch[update_id]))
+        wait_for(lambda: replied(telegram, set(batch.values())) >= max(1, len(batch) // 10), 60, "first shutdown replies")
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(120)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    answered = {chat for chat, _ in telegram.sent}
+    confirmed = [update_id for update_id in batch if update_id <= telegram.confirmed]
+    lost = [update_id for update_id in confirmed if batch[update_id] not in answered]
+    return rate, len(confirmed), len(lost), len(batch) - len(confirmed), proc.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=300, help='backlog size')
+    parser.add_argument('--shutdown-updates', type=int, default=100, help='updates in flight when SIGTERM arrives')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma separated POLLING_CONCURRENCY values')
+    parser.add_argument('--groq-latency', type=float, default=0.3)
+    parser.add_argument('--api-latency', type=float, default=0.02, help='seconds added to every fake Bot API call')
+    args = parser.parse_args()
+
+    groq = FakeGroq(latency=args.groq_latency).serve_in_thread()
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN='123456:fake-polling-test',
+        GROQ_API_KEY='fake-key',
+        GROQ_BASE_URL=groq.url,
+        LOG_GROUP_ID='',
+        STORAGE_BACKEND='memory',
+        REPORT_INTERVAL='0',
+        SEND_GLOBAL_PER_SECOND='1000',  # the fake API has no global flood limit
+    )
+
+    print(f"📥 Backlog of {args.updates} updates, Groq latency {args.groq_latency}s, Bot API latency {args.api_latency}s\n")
+    for concurrency in (int(value) for value in args.concurrency.split(',')):
+        rate, confirmed, lost, left, code = run_once(concurrency, args, env)
+        print(f"POLLING_CONCURRENCY={concurrency:<3} {rate:7.1f} updates/s | shutdown: {confirmed} confirmed, "
+              f"{lost} lost, {left} left for the next start, exit code {code}")
+
+
+if __name__ == '__main__':
+    main()
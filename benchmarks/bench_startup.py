@@ -0,0 +1,121 @@
+"""
+Cold start benchmark: time to first 200, time until the bot is ready and the
+latency of the first AI reply, with and without FAST_STARTUP.
+
+Each run starts a fresh server process pointed at local fake Telegram/Groq
+backends (the fake Bot API adds `--api-latency` to every call, like getMe
+over the internet), polls GET / until it answers 200, then posts one update
+and waits for the reply. Startup phases are read from the server's /metrics.
+
+Run from the repo root:  python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.fake_groq import FakeGroq
+from benchmarks.fake_telegram import FakeTelegram
+from benchmarks.loadtest_webhook import MODES, ROOT, free_port, make_update
+
+SERVERS = {'flask': MODES['flask-async'][0], 'asgi': MODES['asgi'][0]}
+
+
+def startup_phases(port):
+    """{phase: seconds} from the server's `startup` gauge"""
+    phases = {}
+    for line in httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=5).text.splitlines():
+        if line.startswith('bot_startup{'):
+            key, value = line.split('} ')
+            phases[key.split('"')[1]] = float(value)
+    return phases
+
+
+def run_once(server, fast, env, telegram, chat_id):
+    port = free_port()
+    run_env = dict(env, FAST_STARTUP='true' if fast else 'false')
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-c', SERVERS[server].format(port=port)],
+        cwd=ROOT, env=run_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        first_200 = None
+        with httpx.Client(timeout=60) as client:
+            while time.perf_counter() - start < 60:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                        first_200 = time.perf_counter() - start
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.005)
+            if first_200 is None:
+                raise RuntimeError(f"{server} did not answer within 60s")
+
+            # First user message right after the first 200
+            sent_before = sum(1 for chat, _ in telegram.sent if chat == chat_id)
+            posted = time.perf_counter()
+            client.post(f"http://127.0.0.1:{port}/webhook", json=make_update(chat_id, chat_id))
+            while sum(1 for chat, _ in telegram.sent if chat == chat_id) == sent_before:
+                if time.perf_counter() - posted > 60:
+                    raise RuntimeError("no reply within 60s")
+                time.sleep(0.005)
+            first_reply = time.perf_counter() - posted
+
+            while 'ACTIVE' not in client.get(f"http://127.0.0.1:{port}/").text:
+                time.sleep(0.01)
+            time.sleep(0.5)  # let the background prewarm finish
+            phases = startup_phases(port)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return first_200, first_reply, phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--api-latency', type=float, default=0.2, help='seconds added to every fake Bot API call')
+    parser.add_argument('--groq-latency', type=float, default=0.3)
+    parser.add_argument('--servers', default='flask,asgi', help=f"comma separated subset of {list(SERVERS)}")
+    args = parser.parse_args()
+
+    groq = FakeGroq(latency=args.groq_latency).serve_in_thread()
+    telegram = FakeTelegram(latency=args.api_latency)
+    telegram_server = telegram.serve_in_thread()
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN='123456:fake-startup-test',
+        GROQ_API_KEY='fake-key',
+        GROQ_BASE_URL=groq.url,
+        TELEGRAM_API_BASE_URL=f"{telegram_server.url}/bot",
+        LOG_GROUP_ID='',
+        STORAGE_BACKEND='memory',
+        REPORT_INTERVAL='0',
+    )
+
+    print(f"🚀 {args.runs} cold starts per mode, Bot API latency {args.api_latency}s, Groq latency {args.groq_latency}s\n")
+    chat_id = 5000
+    for server in args.servers.split(','):
+        for fast in (False, True):
+            results = []
+            for _ in range(args.runs):
+                chat_id += 1
+                results.append(run_once(server.strip(), fast, env, telegram, chat_id))
+            first_200 = statistics.median(r[0] for r in results)
+            first_reply = statistics.median(r[1] for r in results)
+            mode = f"{server}{' FAST_STARTUP' if fast else ''}"
+            print(f"{mode:<20} first 200 {first_200 * 1000:7.0f} ms | first reply {first_reply * 1000:7.0f} ms "
+                  f"| first 200 + reply {(first_200 + first_reply) * 1000:7.0f} ms")
+            phases = results[-1][2]
+            print(f"{'':<20} phases: " + ", ".join(
+                f"{name} {seconds * 1000:.0f}ms" for name, seconds in sorted(phases.items(), key=lambda item: item[1])
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Webhook prefilter benchmark: updates/sec, CPU and allocations for mixed group
+traffic, full path (json.loads + Update.de_json + process_update for every
+update) vs the raw-JSON prefilter (services/update_filter.py).
+
+The traffic is what busy groups send while AI is off there: text chatter,
+stickers/photos and join messages, plus a share of updates the filter keeps
+(`--keep`, /commands that reach no handler here, so nothing is sent). The
+Application is initialized against the local fake Bot API.
+
+Run from the repo root:  python -m benchmarks.bench_update_filter --updates 20000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:fake-filter-bench')
+os.environ.setdefault('GROQ_API_KEY', 'fake-key')
+os.environ.setdefault('LOG_GROUP_ID', '')
+os.environ.setdefault('REPORT_INTERVAL', '0')
+
+from benchmarks.fake_telegram import FakeTelegram
+
+GROUPS = [-1001000000000 - i for i in range(50)]
+
+
+def make_bodies(count, keep, rng):
+    """Raw webhook bodies: mostly group traffic with AI off, `keep` share of commands"""
+    bodies = []
+    for update_id in range(1, count + 1):
+        chat_id = rng.choice(GROUPS)
+        user = {'id': rng.randint(1, 10 ** 9), 'is_bot': False, 'first_name': 'Member', 'username': 'member'}
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'supergroup', 'title': 'Busy group'},
+            'from': user,
+        }
+        kind = rng.random()
+        if kind < keep:
+            message['text'] = '/unknown@fake_bot'
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': 17}]
+        elif kind < keep + (1 - keep) * 0.7:
+            message['text'] = ' '.join(rng.choice(['ok', 'lol', 'see you', 'thanks', 'where?', 'haha']) for _ in range(8))
+        elif kind < keep + (1 - keep) * 0.9:
+            message['sticker'] = {
+                'file_id': 'CAACAgIAAxkBAAIB', 'file_unique_id': 'AgADAgAD', 'type': 'regular',
+                'width': 512, 'height': 512, 'is_animated': False, 'is_video': False,
+            }
+        else:
+            message['new_chat_members'] = [user]
+        bodies.append(json.dumps({'update_id': update_id, 'message': message}).encode())
+    return bodies
+
+
+async def handle_full(app, body):
+    from telegram import Update
+
+    await app.process_update(Update.de_json(json.loads(body), app.bot))
+
+
+async def handle_filtered(app, body):
+    from telegram import Update
+    from services.update_filter import parse_update, should_process
+
+    update_data = parse_update(body)
+    if should_process(update_data):
+        await app.process_update(Update.de_json(update_data, app.bot))
+
+
+async def measure(handle, app, bodies, sample=2000):
+    """(updates/s, CPU seconds per update, KB allocated at peak per update)"""
+    gc.collect()
+    wall, cpu = time.perf_counter(), time.process_time()
+    for body in bodies:
+        await handle(app, body)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    # Transient memory of one update: traced peak above the level it started at
+    tracemalloc.start()
+    allocated = 0
+    for body in bodies[:sample]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await handle(app, body)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return len(bodies) / wall, cpu / len(bodies), allocated / min(sample, len(bodies)) / 1024
+
+
+async def main_async(args):
+    telegram_server = FakeTelegram().serve_in_thread()
+    os.environ['TELEGRAM_API_BASE_URL'] = f"{telegram_server.url}/bot"
+
+    from config import Config
+    from services.telegram_client import application_builder
+    from handlers.registry import register_handlers
+    from services import update_filter
+
+    Config.TELEGRAM_API_BASE_URL = os.environ['TELEGRAM_API_BASE_URL']
+    app = register_handlers(application_builder().build())
+    await app.initialize()
+
+    bodies = make_bodies(args.updates, args.keep, random.Random(42))
+    print(f"📦 {args.updates} updates, {args.keep:.0%} kept by the filter, orjson "
+          f"{'on' if update_filter.orjson else 'off'}\n")
+    results = {}
+    for name, handle in (('full de_json', handle_full), ('prefilter', handle_filtered)):
+        for body in bodies[:500]:
+            await handle(app, body)  # warm up caches and imports
+        results[name] = await measure(handle, app, bodies)
+        rate, cpu, allocated = results[name]
+        print(f"{name:<13} {rate:10.0f} updates/s | {cpu * 1e6:7.1f} µs CPU/update | {allocated:6.1f} KB peak/update")
+    full, fast = results['full de_json'], results['prefilter']
+    print(f"\n⚡ {fast[0] / full[0]:.1f}x updates/s, {full[1] / fast[1]:.1f}x less CPU, "
+          f"{full[2] / fast[2]:.1f}x less memory per update")
+    await app.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--keep', type=float, default=0.05, help='share of updates the filter lets through')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
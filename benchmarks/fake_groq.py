@@ -0,0 +1,165 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Run standalone:  python -m benchmarks.fake_groq --port 8081 --latency 1.5 --tokens-per-second 200 --pace
+Then point the bot at it with GROQ_BASE_URL=http://127.0.0.1:8081
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from benchmarks.fake_http import FakeHTTPServer, json_response, serve_in_thread
+
+COMPLETIONS_PATH = '/openai/v1/chat/completions'
+MODELS_PATH = '/openai/v1/models'
+
+
+class FakeGroq:
+    """Answers chat completions after a fixed simulated latency.
+
+    Streamed answers then produce `tokens_per_second` words; with
+    `pace_completions` non-streamed answers also take that generation time
+    (about 4 characters per token) on top of `latency`. With
+    `requests_per_minute` set, requests beyond the quota of the current
+    minute get a 429 with Retry-After, and every answer carries Groq's
+    x-ratelimit-* headers.
+    """
+
+    def __init__(self, latency=1.0, reply="This is a canned answer from the fake Groq server.", tokens_per_second=50.0,
+                 requests_per_minute=None, pace_completions=False):
+        self.latency = latency
+        self.pace_completions = pace_completions
+        self.reply = reply
+        self.tokens_per_second = tokens_per_second
+        self.requests_per_minute = requests_per_minute
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.rate_limited = 0
+        self.completions = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request):
+        if request.method == 'GET' and request.path == MODELS_PATH:
+            return json_response({'object': 'list', 'data': [{'id': 'fake-model', 'object': 'model', 'created': 0, 'owned_by': 'fake'}]})
+        if request.method != 'POST' or request.path != COMPLETIONS_PATH:
+            return json_response({'error': {'message': 'not found'}}, 404)
+
+        limited, headers = self._quota()
+        if limited:
+            self.rate_limited += 1
+            return json_response({'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                                 429, headers)
+
+        body = request.json()
+        if body.get('stream'):
+            return 200, dict(headers, **{'Content-Type': 'text/event-stream'}), self._stream(body)
+
+        prompt_tokens = sum(len(m.get('content') or '') for m in body.get('messages', [])) // 4
+        completion_tokens = len(self.reply) // 4
+        generation = completion_tokens / self.tokens_per_second if self.pace_completions else 0.0
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency + generation)
+        finally:
+            self.in_flight -= 1
+        self.completions += 1
+        return json_response({
+            'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake-model'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.reply},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }, headers=headers)
+
+    def _quota(self):
+        """(rate limited?, x-ratelimit-* headers) for one incoming request"""
+        if not self.requests_per_minute:
+            return False, {}
+        now = time.monotonic()
+        if now - self.window_start >= 60:
+            self.window_start, self.window_requests = now, 0
+        reset = 60 - (now - self.window_start)
+        limited = self.window_requests >= self.requests_per_minute
+        if not limited:
+            self.window_requests += 1
+        headers = {
+            'x-ratelimit-limit-requests': str(self.requests_per_minute),
+            'x-ratelimit-remaining-requests': str(self.requests_per_minute - self.window_requests),
+            'x-ratelimit-reset-requests': f"{reset:.2f}s",
+        }
+        if limited:
+            headers['retry-after'] = str(max(1, int(reset)))
+        return limited, headers
+
+    async def _stream(self, body):
+        """Server-sent events: first token after `latency`, then `tokens_per_second`"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake-model'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode()
+
+        try:
+            await asyncio.sleep(self.latency)
+            yield event({'role': 'assistant', 'content': ''})
+            words = self.reply.split(' ')
+            for i, word in enumerate(words):
+                yield event({'content': word if i == 0 else ' ' + word})
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield event({}, 'stop')
+            yield b"data: [DONE]\n\n"
+            self.completions += 1
+        finally:
+            self.in_flight -= 1
+
+    async def serve(self, host='127.0.0.1', port=0):
+        """Start serving and return the running FakeHTTPServer"""
+        return await FakeHTTPServer(self.handle, host, port).start()
+
+    def serve_in_thread(self, host='127.0.0.1', port=0):
+        """Start serving on a background thread and return the server"""
+        return serve_in_thread(self.handle, host, port)
+
+
+async def _main(args):
+    fake = FakeGroq(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                    requests_per_minute=args.rpm, pace_completions=args.pace)
+    server = await fake.serve(args.host, args.port)
+    print(f"🧪 Fake Groq listening on {server.url} (latency {args.latency}s, {args.tokens_per_second} tokens/s)")
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds to the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--pace', action='store_true', help='non-streamed answers also take the generation time')
+    parser.add_argument('--rpm', type=int, default=None, help='requests per minute before 429s')
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,135 @@
+"""
+Minimal asyncio HTTP/1.1 server used by the local fake backends.
+Stdlib only, keep-alive aware, good enough for load tests - not for production.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import urlsplit, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 429: 'Too Many Requests', 500: 'Internal Server Error'}
+
+
+class Request:
+    """Parsed HTTP request"""
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Decode JSON or form-encoded body into a dict"""
+        if not self.body:
+            return dict(self.query)
+        content_type = self.headers.get('content-type', '')
+        if 'application/x-www-form-urlencoded' in content_type:
+            return dict(parse_qsl(self.body.decode()))
+        return json.loads(self.body)
+
+
+def json_response(payload, status=200, headers=None):
+    """Build a (status, headers, body) JSON response tuple"""
+    return status, dict(headers or {}, **{'Content-Type': 'application/json'}), json.dumps(payload).encode()
+
+
+class FakeHTTPServer:
+    """Serve an async `handler(request) -> (status, headers, body)` over HTTP/1.1.
+
+    `body` may be bytes or an async iterator of bytes (sent chunked).
+    """
+
+    def __init__(self, handler, host='127.0.0.1', port=0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.server = None
+        self.requests_served = 0
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port, limit=2 ** 20, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                parts = urlsplit(target)
+                request = Request(method, parts.path, dict(parse_qsl(parts.query)), headers, body)
+
+                try:
+                    status, resp_headers, resp_body = await self.handler(request)
+                except Exception as e:
+                    logger.exception(f"Fake server handler error: {e}")
+                    status, resp_headers, resp_body = json_response({'error': str(e)}, 500)
+                self.requests_served += 1
+                await self._write(writer, status, resp_headers, resp_body)
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer, status, headers, body):
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}"]
+        streaming = not isinstance(body, (bytes, bytearray))
+        if streaming:
+            headers = dict(headers, **{'Transfer-Encoding': 'chunked'})
+        else:
+            headers = dict(headers, **{'Content-Length': str(len(body))})
+        head += [f"{key}: {value}" for key, value in headers.items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        if streaming:
+            async for chunk in body:
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b'\r\n')
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+        else:
+            writer.write(body)
+        await writer.drain()
+
+
+def serve_in_thread(handler, host='127.0.0.1', port=0):
+    """Run a FakeHTTPServer on its own event loop in a daemon thread.
+
+    Keeps the fake backend responsive even when the code under test blocks
+    its own loop (e.g. the sync Groq client).
+    """
+    import threading
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='fake-http', daemon=True).start()
+    server = FakeHTTPServer(handler, host, port)
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    server.loop = loop
+    return server
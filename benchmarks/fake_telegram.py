@@ -0,0 +1,148 @@
+"""
+Local stand-in for the Telegram Bot API.
+
+Run standalone:  python -m benchmarks.fake_telegram --port 8082 --flood-probability 0.05
+Then point the bot at it with TELEGRAM_API_BASE_URL=http://127.0.0.1:8082/bot
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import threading
+import time
+
+from benchmarks.fake_http import FakeHTTPServer, json_response, serve_in_thread
+
+BOT_USER = {'id': 4242, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+
+
+# Calls that can be answered with an injected 429
+FLOOD_METHODS = ('sendMessage', 'editMessageText')
+
+
+class FakeTelegram:
+    """Accepts Bot API calls and records what the bot sent.
+
+    Every call waits `latency` seconds. With `flood_probability` set, that
+    share of sendMessage/editMessageText calls is refused with a 429 and
+    `retry_after`, like Telegram's flood control.
+    """
+
+    def __init__(self, latency=0.0, flood_probability=0.0, retry_after=1, seed=42):
+        self.latency = latency
+        self.flood_probability = flood_probability
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.flooded = 0
+        self.message_ids = itertools.count(1)
+        self.calls = {}  # {method: count}
+        self.sent = []   # [(chat_id, text)]
+        self.edits = []  # [(chat_id, message_id, text)]
+        self.sent_at = []  # perf_counter of each entry in `sent`
+        self.webhook_url = ''
+        self.updates = []  # queued for getUpdates, oldest first
+        self.confirmed = 0  # highest update_id the bot confirmed with `offset`
+        self.updates_lock = threading.Lock()  # push_update is called from other threads
+
+    def push_update(self, update):
+        """Queue an update for the bot's next getUpdates call"""
+        with self.updates_lock:
+            self.updates.append(update)
+
+    async def _get_updates(self, params):
+        # Long polling: answer as soon as updates are queued or `timeout` runs out
+        offset = int(params.get('offset') or 0)
+        limit = min(int(params.get('limit') or 100), 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        while True:
+            with self.updates_lock:
+                if offset:
+                    self.confirmed = max(self.confirmed, offset - 1)
+                    self.updates = [u for u in self.updates if u['update_id'] >= offset]
+                batch = self.updates[:limit]
+            if batch or time.monotonic() >= deadline:
+                return batch
+            await asyncio.sleep(0.01)
+
+    @staticmethod
+    def _chat_id(params):
+        return int(params.get('chat_id', 0))
+
+    def _message(self, params, message_id=None):
+        chat_id = self._chat_id(params)
+        return {
+            'message_id': message_id or next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+            'from': BOT_USER,
+            'text': params.get('text', '')
+        }
+
+    async def handle(self, request):
+        # /bot<token>/<method>
+        method = request.path.rsplit('/', 1)[-1]
+        params = request.json()
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in FLOOD_METHODS and self.flood_probability and self.rng.random() < self.flood_probability:
+            self.flooded += 1
+            return json_response({
+                'ok': False, 'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after}
+            }, 429)
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getUpdates':
+            result = await self._get_updates(params)
+        elif method == 'sendMessage':
+            self.sent.append((self._chat_id(params), params.get('text', '')))
+            self.sent_at.append(time.perf_counter())
+            result = self._message(params)
+        elif method == 'editMessageText':
+            self.edits.append((self._chat_id(params), int(params.get('message_id', 0)), params.get('text', '')))
+            result = self._message(params, int(params.get('message_id', 0)))
+        elif method == 'setWebhook':
+            self.webhook_url = params.get('url', '')
+            result = True
+        elif method == 'deleteWebhook':
+            self.webhook_url = ''
+            result = True
+        elif method == 'getWebhookInfo':
+            result = {'url': self.webhook_url, 'has_custom_certificate': False, 'pending_update_count': 0}
+        elif method in ('sendChatAction', 'close', 'logOut'):
+            result = True
+        else:
+            return json_response({'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}, 404)
+        return json_response({'ok': True, 'result': result})
+
+    async def serve(self, host='127.0.0.1', port=0):
+        """Start serving and return the running FakeHTTPServer"""
+        return await FakeHTTPServer(self.handle, host, port).start()
+
+    def serve_in_thread(self, host='127.0.0.1', port=0):
+        """Start serving on a background thread and return the server"""
+        return serve_in_thread(self.handle, host, port)
+
+
+async def _main(args):
+    fake = FakeTelegram(latency=args.latency, flood_probability=args.flood_probability, retry_after=args.retry_after)
+    server = await fake.serve(args.host, args.port)
+    print(f"🧪 Fake Telegram Bot API listening on {server.url}/bot<token>/")
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--flood-probability', type=float, default=0.0, help='share of sends/edits answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,248 @@
+"""
+Load test of every entry point (Flask/WSGI, ASGI, bot.py polling) with stubbed Telegram and Groq.
+
+Each mode is started as a subprocess pointed at local fake backends, then
+`--updates` synthetic chat messages are replayed: POSTed to /webhook with
+`--concurrency` clients, or queued for getUpdates in polling mode, either as
+fast as possible or at `--rate` updates/s. `--group-share` mixes in group
+chatter that needs no reply. Reports webhook ack latency p50/p99 and rate,
+and for every AI reply the latency from sending the update to the reply
+reaching the fake Bot API (p50/p95/p99) plus replies/sec. The fake Bot API
+can add latency and inject 429s, the fake Groq paces generation.
+
+Run from the repo root:  python -m benchmarks.loadtest_webhook --updates 300 --concurrency 50
+                         python -m benchmarks.loadtest_webhook --rate 50 --group-share 0.5 --flood-probability 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.fake_groq import FakeGroq
+from benchmarks.fake_telegram import FakeTelegram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'flask-sync': ("from werkzeug.serving import run_simple; import flask_app; "
+                   "run_simple('127.0.0.1', {port}, flask_app.app, threaded=True)", {'WEBHOOK_ASYNC': 'false'}),
+    'flask-async': ("from werkzeug.serving import run_simple; import flask_app; "
+                    "run_simple('127.0.0.1', {port}, flask_app.app, threaded=True)", {'WEBHOOK_ASYNC': 'true'}),
+    'asgi': ("import uvicorn; uvicorn.run('asgi_app:app', host='127.0.0.1', port={port}, log_level='warning')", {}),
+}
+
+# Webhook servers plus bot.py long polling
+ENTRY_POINTS = list(MODES) + ['polling']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_update(update_id, chat_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Load'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+            'text': f"Load test question #{update_id}"
+        }
+    }
+
+
+def start_server(mode, port, env):
+    code, extra_env = MODES[mode]
+    proc = subprocess.Popen(
+        [sys.executable, '-c', code.format(port=port)],
+        cwd=ROOT, env=dict(env, **extra_env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if 'ACTIVE' in httpx.get(f"http://127.0.0.1:{port}/", timeout=1).text:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not become ready")
+
+
+def make_group_update(update_id, chat_id):
+    """Group chatter in a chat where AI is off: no reply expected"""
+    update = make_update(update_id, chat_id)
+    update['message']['chat'] = {'id': chat_id, 'type': 'supergroup', 'title': 'Load group'}
+    update['message']['from']['id'] = 7_000_000 + update_id
+    update['message']['text'] = f"group chatter #{update_id}"
+    return update
+
+
+def make_traffic(args, offset, rng):
+    """Synthetic updates in arrival order: (update, expects_reply)"""
+    traffic = []
+    for i in range(args.updates):
+        update_id = offset + i
+        if rng.random() < args.group_share:
+            traffic.append((make_group_update(update_id, -(5000 + i % 10)), False))
+        else:
+            traffic.append((make_update(update_id, 1000 + i % args.chats), True))
+    return traffic
+
+
+async def fire(url, traffic, concurrency, rate, sent_at):
+    """POST the traffic (`rate` updates/s, or as fast as `concurrency` allows)"""
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for index, (update, _) in enumerate(traffic):
+        queue.put_nowait((index, update))
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            while not queue.empty():
+                index, payload = queue.get_nowait()
+                if rate:
+                    await asyncio.sleep(max(0.0, begin + index / rate - time.perf_counter()))
+                start = sent_at[payload['message']['message_id']] = time.perf_counter()
+                resp = await client.post(url, json=payload)
+                latencies.append(time.perf_counter() - start)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, statuses, time.perf_counter() - begin
+
+
+def push(telegram, traffic, rate, sent_at):
+    """Queue the traffic for getUpdates (polling mode)"""
+    begin = time.perf_counter()
+    for index, (update, _) in enumerate(traffic):
+        if rate:
+            time.sleep(max(0.0, begin + index / rate - time.perf_counter()))
+        sent_at[update['message']['message_id']] = time.perf_counter()
+        telegram.push_update(update)
+    return time.perf_counter() - begin
+
+
+def reply_latencies(telegram, traffic, sent_at, first_sent):
+    """Seconds from each update to its reply (replies of a chat arrive in order)"""
+    replies = {}
+    for (chat_id, _), at in zip(telegram.sent[first_sent:], telegram.sent_at[first_sent:]):
+        replies.setdefault(chat_id, []).append(at)
+    latencies = []
+    for update, expects_reply in traffic:
+        if expects_reply and replies.get(update['message']['chat']['id']):
+            latencies.append(replies[update['message']['chat']['id']].pop(0) - sent_at[update['message']['message_id']])
+    return latencies
+
+
+def run_mode(mode, args, env, telegram, offset):
+    traffic = make_traffic(args, offset, random.Random(offset))
+    expected = sum(1 for _, expects_reply in traffic if expects_reply)
+    sent_at = {}
+    first_sent = len(telegram.sent)
+    flooded_before = telegram.flooded
+    latencies, statuses = [], {}
+    if mode == 'polling':
+        proc = subprocess.Popen([sys.executable, 'bot.py'], cwd=ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        calls = telegram.calls.get('getUpdates', 0)
+        deadline = time.time() + 30
+        while telegram.calls.get('getUpdates', 0) <= calls and time.time() < deadline:
+            time.sleep(0.05)
+    else:
+        port = free_port()
+        proc = start_server(mode, port, env)
+    try:
+        start = time.perf_counter()
+        if mode == 'polling':
+            push(telegram, traffic, args.rate, sent_at)
+        else:
+            latencies, statuses, ack_elapsed = asyncio.run(
+                fire(f"http://127.0.0.1:{port}/webhook", traffic, args.concurrency, args.rate, sent_at)
+            )
+        # Wait for every expected reply to reach the fake Telegram
+        deadline = time.time() + args.timeout
+        while len(telegram.sent) - first_sent < expected and time.time() < deadline:
+            time.sleep(0.05)
+        done_elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(60)
+
+    replies = reply_latencies(telegram, traffic, sent_at, first_sent)
+    line = f"{mode:<12} "
+    if latencies:
+        line += (f"ack p50 {percentile(latencies, 50) * 1000:7.1f} ms p99 {percentile(latencies, 99) * 1000:7.1f} ms "
+                 f"{len(latencies) / ack_elapsed:7.1f} acks/s | ")
+    line += (f"reply p50 {percentile(replies, 50) * 1000:7.0f} ms p95 {percentile(replies, 95) * 1000:7.0f} ms "
+             f"p99 {percentile(replies, 99) * 1000:7.0f} ms | {len(replies) / done_elapsed:6.1f} replies/s "
+             f"({len(replies)}/{expected})")
+    if statuses:
+        line += f" | HTTP {statuses}"
+    if telegram.flooded > flooded_before:
+        line += f" | {telegram.flooded - flooded_before} injected 429s"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent webhook POSTs')
+    parser.add_argument('--rate', type=float, default=0, help='updates per second to replay (0 = as fast as possible)')
+    parser.add_argument('--chats', type=int, default=100, help='distinct private chats the updates are spread over')
+    parser.add_argument('--group-share', type=float, default=0.0, help='share of group chatter that needs no reply')
+    parser.add_argument('--groq-latency', type=float, default=0.5, help='seconds to the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0, help='fake Groq generation speed')
+    parser.add_argument('--stream', action='store_true', help='STREAM_RESPONSES=true (edits the reply as tokens arrive)')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='seconds added to every fake Bot API call')
+    parser.add_argument('--flood-probability', type=float, default=0.0, help='share of sends/edits answered with 429')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--modes', default=','.join(ENTRY_POINTS), help=f"comma separated subset of {ENTRY_POINTS}")
+    args = parser.parse_args()
+
+    groq = FakeGroq(latency=args.groq_latency, tokens_per_second=args.tokens_per_second,
+                    pace_completions=True).serve_in_thread()
+    telegram = FakeTelegram(latency=args.api_latency, flood_probability=args.flood_probability)
+    telegram_server = telegram.serve_in_thread()
+
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN='123456:fake-load-test',
+        GROQ_API_KEY='fake-key',
+        GROQ_BASE_URL=groq.url,
+        TELEGRAM_API_BASE_URL=f"{telegram_server.url}/bot",
+        LOG_GROUP_ID='',
+        STORAGE_BACKEND='memory',
+        REPORT_INTERVAL='0',
+        STREAM_RESPONSES='true' if args.stream else 'false',
+    )
+
+    print(f"📊 {args.updates} updates ({args.group_share:.0%} group chatter), "
+          f"{'%g/s' % args.rate if args.rate else f'{args.concurrency} concurrent posts'}, {args.chats} chats, "
+          f"Groq {args.groq_latency}s + {args.tokens_per_second:g} tokens/s, Bot API latency {args.api_latency}s, "
+          f"{args.flood_probability:.0%} 429s\n")
+    for index, mode in enumerate(args.modes.split(',')):
+        run_mode(mode.strip(), args, env, telegram, offset=(index + 1) * 1_000_000)
+
+
+if __name__ == '__main__':
+    main()
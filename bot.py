@@ -1,11 +1,15 @@
 import logging
 import asyncio
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+import contextlib
+import signal
 from config import Config
-from handlers.commands import (start, help_command, clear_command, stats_command, mygroup_command, test_log_command, stop_ai_command, start_ai_command
-                               ,payroll_command)
-from handlers.messages import handle_message, error_handler
+from handlers.registry import register_handlers
+from services.telegram_client import application_builder
 from services.logger import LoggerService
+from services.log_sink import log_sink
+from services.storage import storage
+from services.chat_gate import chat_gate
+from services.moderation import moderation_engine
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -13,62 +17,83 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def periodic_report_task(application):
-    """Background task to send periodic reports"""
-    # Wait 10 seconds before first report (so bot is fully started)
-    await asyncio.sleep(10)
-    logger.info("Starting periodic reports...")
-    
-    while True:
-        try:
-            # Create a simple context-like object with bot
-            class SimpleContext:
-                def __init__(self, bot):
-                    self.bot = bot
-            
-            context = SimpleContext(application.bot)
-            await LoggerService.send_periodic_report(context)
-        except Exception as e:
-            logger.error(f"Error in periodic report: {e}")
-        
-        await asyncio.sleep(120)  # Wait 2 minutes before next report
+report_task = None
 
 async def post_init(application):
     """Called after the bot is initialized"""
+    global report_task
+    await asyncio.to_thread(moderation_engine.warm)  # compile BANNED_WORDS before the first message
     # Start the periodic report task
-    asyncio.create_task(periodic_report_task(application))
-    logger.info("📊 Periodic report task started (every 2 minutes)")
+    report_task = asyncio.create_task(LoggerService.periodic_report_task(application.bot))
+    logger.info(f"📊 Periodic report task started (every {Config.REPORT_INTERVAL}s)")
+
+async def run_polling(application):
+    """Long-poll until SIGINT/SIGTERM, then finish fetched updates and in-flight replies before exiting.
+
+    Application.run_polling confirms every fetched update when it stops but
+    drops the ones still queued, so the shutdown sequence is done here:
+    stop fetching, drain the queue and the AI turns running detached in
+    debounce mode (at most POLLING_DRAIN_TIMEOUT seconds each), stop the
+    application (waits for running handlers), then flush the log group sink
+    and storage.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):  # not available on Windows
+            loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    try:
+        await post_init(application)
+        await application.updater.start_polling(
+            timeout=Config.POLLING_TIMEOUT,
+            allowed_updates=Config.POLLING_ALLOWED_UPDATES or None,
+            drop_pending_updates=Config.POLLING_DROP_PENDING
+        )
+        await application.start()
+        logger.info(
+            f"📥 Polling (long-poll {Config.POLLING_TIMEOUT}s, {Config.POLLING_CONCURRENCY} concurrent updates, "
+            f"backlog {'dropped' if Config.POLLING_DROP_PENDING else 'kept'})"
+        )
+        await stop.wait()
+
+        logger.info("🛑 Stopping: no new updates, finishing the fetched ones")
+        await application.updater.stop()
+        try:
+            await asyncio.wait_for(application.update_queue.join(), Config.POLLING_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {application.update_queue.qsize()} fetched updates left unprocessed after {Config.POLLING_DRAIN_TIMEOUT}s")
+        running = await chat_gate.drain(Config.POLLING_DRAIN_TIMEOUT)  # debounced turns run detached from the queue
+        if running:
+            logger.warning(f"⚠️ {running} AI turns still running after {Config.POLLING_DRAIN_TIMEOUT}s")
+    finally:
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()  # waits for handlers still running
+        if report_task is not None:
+            report_task.cancel()
+        await log_sink.flush()
+        await application.shutdown()
+        storage.close()
+        logger.info("👋 Bot stopped")
 
 def main():
     """Start the bot"""
     Config.validate()
-    
-    application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
-    
+
+    application = application_builder().concurrent_updates(max(1, Config.POLLING_CONCURRENCY)).build()
+
     # Register command handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("clear", clear_command))
-    application.add_handler(CommandHandler("stats", stats_command))
-    application.add_handler(CommandHandler("myGroup", mygroup_command))
-    application.add_handler(CommandHandler("testlog", test_log_command))
-    application.add_handler(CommandHandler("stopAI", stop_ai_command))
-    application.add_handler(CommandHandler("startAI", start_ai_command))
-    application.add_handler(CommandHandler("payroll", payroll_command))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    application.add_error_handler(error_handler)
-    
-    # Set up post_init callback to start periodic task
-    application.post_init = post_init
-    
+    register_handlers(application)
+
     logger.info("🤖 Bot started successfully!")
     print("🤖 Bot is running... Press Ctrl+C to stop.")
-    print("📊 Sending activity reports every 2 minutes to log group")
-    
+    print(f"📊 Sending activity reports every {Config.REPORT_INTERVAL}s to log group")
+
     # Start bot
-    application.run_polling(
-        drop_pending_updates=True
-    )
+    asyncio.run(run_polling(application))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -11,15 +11,122 @@ class Config:
     
     # Optional with defaults
     GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
+    GROQ_FAST_MODEL = os.getenv('GROQ_FAST_MODEL', 'llama-3.1-8b-instant')  # empty = single model
     MAX_HISTORY = int(os.getenv('MAX_HISTORY', '10'))
     MAX_TOKENS = int(os.getenv('MAX_TOKENS', '1024'))
     TEMPERATURE = float(os.getenv('TEMPERATURE', '0.7'))
     MAX_MESSAGE_LENGTH = int(os.getenv('MAX_MESSAGE_LENGTH', '1000'))
     
+    # Streaming replies (progressively edited Telegram message)
+    STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'false').lower() == 'true'
+    STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.0'))  # min seconds between edits (private)
+    STREAM_GROUP_EDIT_INTERVAL = float(os.getenv('STREAM_GROUP_EDIT_INTERVAL', '3.0'))  # groups: ~20 msgs/min
+    STREAM_MIN_DELTA = int(os.getenv('STREAM_MIN_DELTA', '40'))  # min new characters per edit
+    
+    # Per-chat AI turns
+    CHAT_DEBOUNCE = float(os.getenv('CHAT_DEBOUNCE', '0'))  # seconds of quiet before answering a burst (0 = off)
+    CHAT_DEBOUNCE_MAX = float(os.getenv('CHAT_DEBOUNCE_MAX', '5'))  # longest a burst is collected
+    
+    # Prompt context
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))  # history tokens sent per request
+    CONTEXT_SUMMARY = os.getenv('CONTEXT_SUMMARY', 'false').lower() == 'true'  # summarize turns outside the budget
+    SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', '256'))
+    
+    # Completion cache for repeated prompts
+    RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'false').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '3600'))  # seconds
+    RESPONSE_CACHE_CONTEXT = int(os.getenv('RESPONSE_CACHE_CONTEXT', '3'))  # trailing messages in the cache key (question + previous exchange)
+    RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv('RESPONSE_CACHE_MAX_TEMPERATURE', '0.3'))  # above = bypass
+    
+    # Conversation memory limits
+    MAX_CONVERSATIONS = int(os.getenv('MAX_CONVERSATIONS', '10000'))  # chats kept in memory
+    CONVERSATION_TTL = int(os.getenv('CONVERSATION_TTL', '86400'))  # seconds idle before a chat is dropped (0 = never)
+    CONVERSATION_MEMORY_MB = int(os.getenv('CONVERSATION_MEMORY_MB', '64'))
+    
+    # Groq HTTP client (async, pooled)
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')  # None = official Groq API
+    GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '60'))
+    GROQ_MAX_CONNECTIONS = int(os.getenv('GROQ_MAX_CONNECTIONS', '100'))
+    GROQ_MAX_KEEPALIVE = int(os.getenv('GROQ_MAX_KEEPALIVE', '20'))
+    GROQ_KEEPALIVE_EXPIRY = float(os.getenv('GROQ_KEEPALIVE_EXPIRY', '30'))
+    
+    # Model routing (services/model_router.py)
+    MODEL_ROUTING = os.getenv('MODEL_ROUTING', 'false').lower() == 'true'  # send short/simple messages to GROQ_FAST_MODEL
+    MODEL_FALLBACK = os.getenv('MODEL_FALLBACK', 'true').lower() == 'true'  # retry on the other model when one fails
+    ROUTER_SHORT_CHARS = int(os.getenv('ROUTER_SHORT_CHARS', '120'))  # longer messages use GROQ_MODEL
+    ROUTER_MAX_FAST_TOKENS = int(os.getenv('ROUTER_MAX_FAST_TOKENS', '1500'))  # larger prompts use GROQ_MODEL
+    MODEL_SLOW_SECONDS = float(os.getenv('MODEL_SLOW_SECONDS', '10'))  # a call slower than this is a strike
+    MODEL_BREAKER_STRIKES = int(os.getenv('MODEL_BREAKER_STRIKES', '3'))  # strikes in a row that open the circuit
+    MODEL_BREAKER_COOLDOWN = int(os.getenv('MODEL_BREAKER_COOLDOWN', '60'))  # seconds a model is skipped
+    
+    # Groq admission control (services/llm_limiter.py)
+    LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '16'))  # concurrent completion calls
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))  # on 429 / 5xx / connection errors
+    LLM_RETRY_BASE = float(os.getenv('LLM_RETRY_BASE', '0.5'))  # seconds, doubled per attempt (jittered)
+    LLM_RETRY_MAX = float(os.getenv('LLM_RETRY_MAX', '20'))  # longest single wait
+    
+    # Telegram Bot API
+    TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', 'https://sokha.pythonanywhere.com/webhook')
+    
+    # Outbound Bot API client (services/telegram_client.py)
+    TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '64'))  # shared HTTP connections
+    TELEGRAM_HTTP2 = os.getenv('TELEGRAM_HTTP2', 'false').lower() == 'true'  # needs httpx[http2]
+    TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5'))
+    TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', '10'))
+    TELEGRAM_WRITE_TIMEOUT = float(os.getenv('TELEGRAM_WRITE_TIMEOUT', '10'))
+    TELEGRAM_POOL_TIMEOUT = float(os.getenv('TELEGRAM_POOL_TIMEOUT', '5'))  # wait for a free connection
+    SEND_GLOBAL_PER_SECOND = float(os.getenv('SEND_GLOBAL_PER_SECOND', '30'))  # messages per second, all chats
+    SEND_CHAT_PER_SECOND = float(os.getenv('SEND_CHAT_PER_SECOND', '1'))  # per private chat
+    SEND_GROUP_PER_MINUTE = float(os.getenv('SEND_GROUP_PER_MINUTE', '20'))  # per group/channel
+    SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', '3'))  # messages a quiet chat may send at once
+    SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))  # RetryAfter answers waited out per call
+    
+    # User activity tracking
+    USER_ACTIVITY_MAX = int(os.getenv('USER_ACTIVITY_MAX', '50000'))  # users kept in memory
+    USER_ACTIVITY_TTL = int(os.getenv('USER_ACTIVITY_TTL', '604800'))  # seconds idle before eviction (0 = never)
+    UNIQUE_USERS_APPROX = os.getenv('UNIQUE_USERS_APPROX', 'false').lower() == 'true'  # HyperLogLog count in /stats
+    
+    # Persistence (conversations, AI toggles, user activity, counters)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite').lower()  # sqlite | memory
+    STORAGE_PATH = os.getenv('STORAGE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot_state.db'))
+    STORAGE_FLUSH_INTERVAL = float(os.getenv('STORAGE_FLUSH_INTERVAL', '1.0'))  # seconds between batched writes
+    STORAGE_BATCH_SIZE = int(os.getenv('STORAGE_BATCH_SIZE', '500'))  # flush early once this many keys are dirty
+    STORAGE_SHARED = os.getenv('STORAGE_SHARED', 'false').lower() == 'true'  # several worker processes share STORAGE_PATH
+    
+    # Webhook processing (flask_app.py / asgi_app.py)
+    WEBHOOK_ASYNC = os.getenv('WEBHOOK_ASYNC', 'true').lower() == 'true'  # ack first, process in background
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '500'))
+    WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', '32'))
+    WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))  # ASGI shutdown: seconds to finish queued updates
+    WEBHOOK_PREFILTER = os.getenv('WEBHOOK_PREFILTER', 'true').lower() == 'true'  # drop group chatter before Update.de_json
+    UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', '10000'))  # recent update_ids remembered (0 = off)
+    
+    # Long polling (bot.py)
+    POLLING_CONCURRENCY = int(os.getenv('POLLING_CONCURRENCY', '32'))  # updates handled at the same time (1 = one by one)
+    POLLING_TIMEOUT = int(os.getenv('POLLING_TIMEOUT', '30'))  # getUpdates long-poll seconds (Telegram allows up to 50)
+    POLLING_ALLOWED_UPDATES = [u for u in os.getenv('POLLING_ALLOWED_UPDATES', 'message').split(',') if u]  # empty = all types
+    POLLING_DROP_PENDING = os.getenv('POLLING_DROP_PENDING', 'false').lower() == 'true'  # false = answer the backlog after a restart
+    POLLING_DRAIN_TIMEOUT = float(os.getenv('POLLING_DRAIN_TIMEOUT', '30'))  # seconds to finish fetched updates on shutdown
+    
+    # Cold start (services/startup.py)
+    FAST_STARTUP = os.getenv('FAST_STARTUP', 'false').lower() == 'true'  # serve first, initialize the bot in the background
+    PREWARM = os.getenv('PREWARM', 'true').lower() == 'true'  # import groq and open its connection after startup
+    STARTUP_WAIT_TIMEOUT = float(os.getenv('STARTUP_WAIT_TIMEOUT', '30'))  # seconds a webhook call waits for the bot
+    
+    # Instrumentation (/metrics route, /perf command)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    
     # Optional
     LOG_GROUP_ID = os.getenv('LOG_GROUP_ID')
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '5'))  # seconds to collect log events per message
+    LOG_RATE_PER_MINUTE = int(os.getenv('LOG_RATE_PER_MINUTE', '18'))  # Telegram allows ~20/min per group
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '1000'))  # oldest events are dropped beyond this
+    REPORT_INTERVAL = int(os.getenv('REPORT_INTERVAL', '120'))  # seconds between activity reports (0 = off)
     ADMIN_IDS = os.getenv('ADMIN_IDS', '').split(',') if os.getenv('ADMIN_IDS') else []
     BANNED_WORDS = os.getenv('BANNED_WORDS', '').split(',') if os.getenv('BANNED_WORDS') else []
+    BANNED_WORDS_BOUNDARY = os.getenv('BANNED_WORDS_BOUNDARY', 'false').lower() == 'true'  # whole words only (not for Khmer)
     
     @classmethod
     def validate(cls):
@@ -1,14 +1,17 @@
-import logging
+from services.startup import startup, prewarm, import_modules
 import asyncio
+import logging
 import os
 import sys
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from flask import Flask, request, jsonify
-from telegram import Update, Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from flask import Flask, Response, request, jsonify
 from config import Config
 from dotenv import load_dotenv
+from services.update_dispatcher import UpdateDispatcher
+from services.metrics import metrics
+from services.update_dedup import update_dedup
+# telegram / handlers are imported in initialize_bot (off the critical path with FAST_STARTUP)
 
 # --- PHNOM PENH TIME LOGGING SETUP ---
 class PhnomPenhFormatter(logging.Formatter):
@@ -26,11 +29,14 @@ logger.addHandler(handler)
 logger.propagate = False 
 
 app = Flask(__name__)
+startup.mark('imports')
 
 # Global instances
 bot_app = None
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+startup_future = None  # background initialization (FAST_STARTUP)
+# Long-lived event loop thread that owns bot_app and processes updates
+dispatcher = UpdateDispatcher(Config.WEBHOOK_QUEUE_SIZE, Config.WEBHOOK_CONCURRENCY).start()
+metrics.register_gauge('webhook_queue', 'Webhook queue depth and counters', dispatcher.get_stats)
 
 def reload_config():
     """Force reload the .env file to ensure the NEW token is used"""
@@ -38,9 +44,13 @@ def reload_config():
     # load_dotenv with override=True is critical to replace the old token in memory
     load_dotenv(os.path.join(project_home, '.env'), override=True)
     
-    import importlib
-    import config
-    importlib.reload(config)
+    # Every module holds the same Config class, so refresh the secrets and word list on it
+    # (importlib.reload would only build a new class nobody references)
+    Config.TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+    Config.GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+    # New list object: the moderation engine recompiles on its next check
+    Config.BANNED_WORDS = os.getenv('BANNED_WORDS', '').split(',') if os.getenv('BANNED_WORDS') else []
+    Config.BANNED_WORDS_BOUNDARY = os.getenv('BANNED_WORDS_BOUNDARY', 'false').lower() == 'true'
     
     token = Config.TELEGRAM_BOT_TOKEN or ""
     logger.info(f"🔄 Config reloaded (KH Time). Token prefix: {token[:8]}...")
@@ -51,41 +61,35 @@ async def initialize_bot():
     
     try:
         # 1. Reload the environment variables first
-        reload_config()
+        with startup.phase('config_reload'):
+            reload_config()
         
         logger.info("🇰🇭 Starting bot initialization in Phnom Penh time...")
         
-        # Import handlers inside function to avoid circular imports
-        from handlers.commands import (
-            start, help_command, clear_command, stats_command,
-            mygroup_command, test_log_command, stop_ai_command,
-            start_ai_command, debug_command, payroll_command
-        )
-        from handlers.messages import handle_message, error_handler
+        # Import handlers inside function to avoid circular imports (in a thread, the loop keeps serving)
+        with startup.phase('handlers_import'):
+            await import_modules('handlers.registry', 'services.telegram_client')
+        from handlers.registry import register_handlers
+        from services.telegram_client import application_builder
         
         # Validate config
         Config.validate()
         
         # Build application
-        bot_app = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
-        
-        # Register ALL handlers
-        bot_app.add_handler(CommandHandler("start", start))
-        bot_app.add_handler(CommandHandler("help", help_command))
-        bot_app.add_handler(CommandHandler("clear", clear_command))
-        bot_app.add_handler(CommandHandler("stats", stats_command))
-        bot_app.add_handler(CommandHandler("myGroup", mygroup_command))
-        bot_app.add_handler(CommandHandler("testlog", test_log_command))
-        bot_app.add_handler(CommandHandler("stopAI", stop_ai_command))
-        bot_app.add_handler(CommandHandler("startAI", start_ai_command))
-        bot_app.add_handler(CommandHandler("debug", debug_command))
-        bot_app.add_handler(CommandHandler("payroll", payroll_command))
+        def build_application():
+            application = application_builder().build()
+            # Register ALL handlers
+            register_handlers(application)
+            return application
         
-        bot_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        bot_app.add_error_handler(error_handler)
+        with startup.phase('application_build'):
+            application = await asyncio.to_thread(build_application)
         
-        # Initialize the internal telegram-bot state
-        await bot_app.initialize()
+        # Initialize the internal telegram-bot state (getMe)
+        with startup.phase('bot_initialize'):
+            await application.initialize()
+        bot_app = application
+        startup.mark('bot_ready')
         logger.info("✅ Bot initialized successfully with current token")
         return bot_app
         
@@ -94,12 +98,54 @@ async def initialize_bot():
         bot_app = None
         return None
 
+async def background_start():
+    """FAST_STARTUP: initialize the bot once the app is already serving, then prewarm"""
+    if await initialize_bot() is not None:
+        start_periodic_reports()
+    await prewarm()
+
+report_task = None
+
+def start_periodic_reports():
+    """Run the activity report task on the dispatcher loop (once per worker)"""
+    global report_task
+    if bot_app is not None and report_task is None:
+        from services.logger import LoggerService
+        report_task = dispatcher.schedule(LoggerService.periodic_report_task(bot_app.bot))
+
 # Trigger initial startup
-bot_app = loop.run_until_complete(initialize_bot())
+if Config.FAST_STARTUP:
+    # Serve immediately; the first webhook call waits for the bot if it is not ready yet
+    startup_future = dispatcher.schedule(background_start())
+else:
+    bot_app = dispatcher.run(initialize_bot())
+    start_periodic_reports()
+    dispatcher.schedule(prewarm())
+startup.mark('serving')
+
+def _after_fork():
+    # Pre-forking servers (gunicorn --preload) import the app once; the bot's connection pool and
+    # tasks belong to the parent's loop, so every worker builds its own (the dispatcher restarted already)
+    global bot_app, startup_future, report_task
+    bot_app = None
+    report_task = None
+    startup_future = dispatcher.schedule(background_start())
+
+os.register_at_fork(after_in_child=_after_fork)
+
+def wait_for_startup():
+    """Block until background initialization has finished (FAST_STARTUP)"""
+    if bot_app is None and startup_future is not None and not startup_future.done():
+        with metrics.timer('startup_wait'):
+            try:
+                startup_future.result(Config.STARTUP_WAIT_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"⚠️ Still starting after {Config.STARTUP_WAIT_TIMEOUT}s: {e!r}")
 
 @app.route('/')
 def index():
-    status = "✅ ACTIVE" if bot_app else "❌ FAILED"
+    starting = startup_future is not None and not startup_future.done()
+    status = "✅ ACTIVE" if bot_app else ("⏳ STARTING" if starting else "❌ FAILED")
     token_val = Config.TELEGRAM_BOT_TOKEN or "MISSING"
     kh_time = datetime.now(ZoneInfo('Asia/Phnom_Penh')).strftime('%Y-%m-%d %H:%M:%S')
     return f"🤖 Bot Status: {status}<br>Time: {kh_time}<br>Token Prefix: {token_val[:8]}...", 200
@@ -109,35 +155,78 @@ def webhook():
     """Handle Telegram updates with self-healing check"""
     global bot_app
     
+    wait_for_startup()
+    
     # Self-healing: If bot failed to initialize, try again when a message arrives
     if bot_app is None:
         logger.warning("⚠️ Bot was None at webhook call. Attempting emergency re-init...")
-        bot_app = loop.run_until_complete(initialize_bot())
+        bot_app = dispatcher.run(initialize_bot())
         if bot_app is None:
             return "Bot Initialization Failed", 500
+        start_periodic_reports()
         
+    update_id = None
     try:
-        update_data = request.get_json(force=True)
-        update = Update.de_json(update_data, bot_app.bot)
-        loop.run_until_complete(bot_app.process_update(update))
+        from telegram import Update
+        from services.update_filter import parse_update, should_process
+        
+        with metrics.timer('webhook_parse'):
+            update_data = parse_update(request.get_data())
+        update_id = update_data.get('update_id')
+        if not update_dedup.accept(update_id):
+            logger.info(f"🔁 Dropped redelivered update {update_id}")
+            return "OK", 200
+        if not should_process(update_data):
+            return "OK", 200
+        with metrics.timer('de_json'):
+            update = Update.de_json(update_data, bot_app.bot)
+        
+        if not Config.WEBHOOK_ASYNC:
+            with metrics.timer('dispatch'):
+                # Worst case of one AI turn: every Groq attempt runs into its timeout
+                dispatcher.run(bot_app.process_update(update), timeout=Config.GROQ_TIMEOUT * (Config.LLM_MAX_RETRIES + 1))
+            return "OK", 200
+        
+        # Ack immediately; updates of the same chat are still processed in order
+        chat_key = update.effective_chat.id if update.effective_chat else update.update_id
+        app_ref = bot_app
+        if not dispatcher.submit(chat_key, lambda: app_ref.process_update(update)):
+            logger.warning(f"⚠️ Update queue full ({dispatcher.max_pending}), asking Telegram to retry")
+            update_dedup.forget(update_id)
+            return "Busy", 503
         return "OK", 200
     except Exception as e:
         logger.error(f"❌ Webhook Error: {e}")
+        if update_id is not None:
+            update_dedup.forget(update_id)
         return "Error", 500
 
+@app.route('/queue_stats')
+def queue_stats():
+    """Webhook queue depth and backpressure counters"""
+    return jsonify(dispatcher.get_stats()), 200
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Per-stage latency histograms and counters (Prometheus text format)"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/set_webhook')
 def set_webhook():
     """Force Telegram to use the current URL and Token"""
+    wait_for_startup()
+    if bot_app is None:
+        return "❌ Error: bot not initialized"
     try:
-        url = "https://sokha.pythonanywhere.com/webhook"
-        # Use fresh token from Config
-        bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
+        url = Config.WEBHOOK_URL
+        
+        async def reset_webhook():
+            # Clean old webhooks first to avoid conflicts, then set the new one
+            await bot_app.bot.delete_webhook(drop_pending_updates=True)
+            return await bot_app.bot.set_webhook(url=url)
         
-        temp_loop = asyncio.new_event_loop()
-        # Clean old webhooks first to avoid conflicts
-        temp_loop.run_until_complete(bot.delete_webhook(drop_pending_updates=True))
-        # Set new
-        success = temp_loop.run_until_complete(bot.set_webhook(url=url))
+        # Runs on the dispatcher loop with the shared bot and connection pool
+        success = dispatcher.run(reset_webhook())
         
         return f"✅ Webhook set to {url}. Success: {success}"
     except Exception as e:
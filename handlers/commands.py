@@ -4,13 +4,16 @@ from telegram.ext import ContextTypes, CommandHandler
 from services.logger import LoggerService
 from services.bot_service import BotService
 from services.payroll_service import PayrollService
+from services.conversation_store import conversation_store
+from services.context_builder import context_builder
+from services.response_cache import response_cache
+from services.log_sink import log_sink
+from services.metrics import metrics
+from services.chat_gate import chat_gate
+from services.model_router import model_router, MODES
 import datetime
 from zoneinfo import ZoneInfo
 
-# Changed from user_conversations to chat_conversations
-# This makes each chat completely separate
-chat_conversations = {}
-
 def get_cambodia_time():
     """Get current Cambodia time"""
     cambodia_tz = ZoneInfo('Asia/Phnom_Penh')
@@ -21,7 +24,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user_id = update.effective_user.id
     username = update.effective_user.username
-    chat_conversations[chat_id] = []
+    conversation_store.clear(chat_id)
+    context_builder.forget(chat_id)
     
     welcome_msg = f"""🇰🇭 ជំរាបសួរ! (Hello!)
 
@@ -54,7 +58,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• /myGroup — 👥 Group settings\n\n"
         "<b>🤖 AI Engine Control</b>\n"
         "• /startAI — 🟢 Enable AI responses\n"
-        "• /stopAI — 🔴 Disable AI responses\n\n"
+        "• /stopAI — 🔴 Disable AI responses\n"
+        "• /model — 🧠 Fast or smart model\n\n"
         "<b>🤖 More Feature</b>\n"
         "• /payroll — 💰 count the days until your next pay\n\n"
         "────────────────────\n"
@@ -80,20 +85,24 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /clear command"""
     chat_id = update.effective_chat.id
-    chat_conversations[chat_id] = []
+    conversation_store.clear(chat_id)
+    context_builder.forget(chat_id)
     await update.message.reply_text("✅ Conversation cleared!")
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /stats command"""
     stats = BotService.get_stats()
     chat_id = update.effective_chat.id
-    messages_in_chat = len(chat_conversations.get(chat_id, []))
+    messages_in_chat = conversation_store.count(chat_id)
+    store_stats = conversation_store.get_stats()
     
     stats_message = (
         "📊 Bot Statistics\n\n"
         f"📨 Total Messages: {stats['total_messages']}\n"
         f"💬 This Chat: {messages_in_chat}\n"
         f"👥 Users: {stats['unique_users']}\n"
+        f"🧠 Chats in memory: {store_stats['chats']} ({store_stats['memory_kb']} KB, "
+        f"hit rate {store_stats['hit_rate']:.0%}, {store_stats['evictions']} evicted)\n"
         f"⏱ Uptime: {stats['uptime']}"
     )
     
@@ -131,7 +140,7 @@ async def test_log_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"🧪 Test Log\nFrom: @{update.effective_user.username or 'Unknown'}",
             "TEST"
         )
-        await update.message.reply_text("✅ Log sent!")
+        await update.message.reply_text("✅ Log queued! It will arrive with the next batch.")
     except Exception as e:
         await update.message.reply_text(f"❌ Error: {str(e)}")
 
@@ -160,7 +169,11 @@ async def debug_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     is_enabled = BotService.is_ai_enabled(chat_id)
     
     # Get conversation length
-    conv_length = len(chat_conversations.get(chat_id, []))
+    conv_length = conversation_store.count(chat_id)
+    store_stats = conversation_store.get_stats()
+    cache_stats = response_cache.get_stats()
+    sink_stats = log_sink.get_stats()
+    gate_stats = chat_gate.get_stats()
     
     # Get stats
     stats = BotService.get_stats()
@@ -179,7 +192,27 @@ async def debug_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"<b>AI Status:</b>\n"
         f"• AI Enabled: {'✅ YES' if is_enabled else '❌ NO'}\n"
         f"• Messages in chat: {conv_length}\n"
-        f"• Active conversations: {len(chat_conversations)}\n\n"
+        f"• Active conversations: {store_stats['chats']}\n\n"
+        
+        f"<b>AI Turns:</b>\n"
+        f"• Turns: {gate_stats['turns']} (waited {gate_stats['waited']}, merged {gate_stats['coalesced']})\n"
+        f"• Chats busy: {gate_stats['active_chats']} / Debounce: {gate_stats['debounce']}s\n\n"
+        
+        f"<b>Conversation Store:</b>\n"
+        f"• Memory: {store_stats['memory_kb']} KB\n"
+        f"• Hits / Misses: {store_stats['hits']} / {store_stats['misses']}\n"
+        f"• Evicted (LRU / TTL / memory): {store_stats['evicted_lru']} / "
+        f"{store_stats['evicted_ttl']} / {store_stats['evicted_memory']}\n\n"
+        
+        f"<b>Response Cache:</b>\n"
+        f"• Enabled: {'✅ YES' if response_cache.enabled else '❌ NO'}\n"
+        f"• Entries: {cache_stats['entries']} (hit rate {cache_stats['hit_rate']:.0%})\n"
+        f"• Hits / Misses / Bypassed: {cache_stats['hits']} / {cache_stats['misses']} / {cache_stats['bypassed']}\n\n"
+        
+        f"<b>Log Group Sink:</b>\n"
+        f"• Pending: {sink_stats['pending']} / Queued: {sink_stats['queued']}\n"
+        f"• Sent: {sink_stats['sent_events']} events in {sink_stats['sent_messages']} messages\n"
+        f"• Dropped / Failed / Rate limited: {sink_stats['dropped']} / {sink_stats['failed']} / {sink_stats['rate_limited']}\n\n"
         
         f"<b>Bot Stats:</b>\n"
         f"• Total Messages: {stats['total_messages']}\n"
@@ -199,6 +232,70 @@ async def debug_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"AI enabled: {is_enabled}, Conv length: {conv_length}"
     )
 
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin command: per-stage latency percentiles"""
+    if not await BotService.check_user_permission(update.effective_user.id):
+        await update.message.reply_text("❌ You don't have permission to use this command.")
+        return
+    
+    if not metrics.enabled:
+        await update.message.reply_text("📉 Metrics are disabled (METRICS_ENABLED=false)")
+        return
+    
+    summary = metrics.summary()
+    if not summary:
+        await update.message.reply_text("📉 No measurements yet")
+        return
+    
+    def ms(value):
+        return f"{value * 1000:.0f}" if value is not None else "-"
+    
+    lines = ["⏱ <b>Pipeline Latency</b> (ms: p50 / p95 / p99)\n"]
+    for stage, s in summary.items():
+        lines.append(f"• <code>{stage}</code>: {ms(s['p50'])} / {ms(s['p95'])} / {ms(s['p99'])} ({s['count']}x)")
+    
+    errors = [(label, value) for (name, label), value in metrics.counters.items() if name.endswith('errors')]
+    if errors:
+        lines.append("\n<b>Errors:</b>")
+        lines.extend(f"• <code>{label}</code>: {value}" for label, value in sorted(errors))
+    
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
+async def model_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /model command: show or set this chat's model mode"""
+    chat_id = update.effective_chat.id
+    
+    if context.args:
+        mode = context.args[0].lower()
+        if mode not in MODES:
+            await update.message.reply_text(f"❌ Unknown mode. Use one of: {', '.join(MODES)}")
+            return
+        if not await BotService.check_user_permission(update.effective_user.id):
+            await update.message.reply_text("❌ You don't have permission to use this command.")
+            return
+        model_router.set_mode(chat_id, mode)
+        await update.message.reply_text(f"✅ Model mode for this chat: {mode}")
+        return
+    
+    lines = [
+        "🧠 <b>Model Routing</b>\n",
+        f"• This chat: <b>{model_router.get_mode(chat_id)}</b> (/model auto | fast | smart)",
+        f"• Smart: <code>{model_router.primary}</code>",
+        f"• Fast: <code>{model_router.fast or '-'}</code>",
+        f"• Auto routing: {'✅ ON' if model_router.routing else '❌ OFF'} / Fallback: {'✅ ON' if model_router.fallback else '❌ OFF'}",
+    ]
+    for model, s in model_router.get_stats().items():
+        p50 = f"{s['p50']:.1f}s" if s['p50'] is not None else "-"
+        p95 = f"{s['p95']:.1f}s" if s['p95'] is not None else "-"
+        lines.append(
+            f"\n<code>{model}</code>{' 🔌 circuit open' if s['open'] else ''}\n"
+            f"• Calls: {s['calls']} (failed {s['failures']}, fell back {s['fallbacks']})\n"
+            f"• Latency p50 / p95: {p50} / {p95}\n"
+            f"• Tokens in / out: {s['prompt_tokens']} / {s['completion_tokens']}"
+        )
+    
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
 async def payroll_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /payroll command"""
     pay_info = PayrollService.get_next_payday_info()
@@ -1,58 +1,184 @@
 import logging
-import re
+import os
+import time
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import Config
 from services.logger import LoggerService
 from services.bot_service import BotService
-from handlers.commands import chat_conversations
+from services.conversation_store import conversation_store
+from services.context_builder import context_builder
+from services.stream_editor import StreamingReply
+from services.response_cache import response_cache
+from services.reporting import activity
+from services.metrics import metrics
+from services.markdown_v2 import to_markdown_v2
+from services.chat_gate import chat_gate
+from services.reply_splitter import send_reply
+from services.model_router import model_router
+from services.context_builder import estimate_tokens
+from services.storage import storage
+from services.llm_limiter import llm_limiter, LLMBusyError, PRIORITY_PRIVATE, PRIORITY_GROUP, PRIORITY_BACKGROUND
 
 logger = logging.getLogger(__name__)
 
-# Lazy Groq client
+SYSTEM_PROMPT = "You are a helpful AI assistant. Respond helpfully and concisely. Use markdown for code when appropriate."
+
+# Lazy Groq client (async, so completions never block the event loop)
 groq_client = None
 
+def _forget_groq_client():
+    # A forked worker must not share the parent's httpx pool (bound to the parent's event loop)
+    global groq_client
+    groq_client = None
+
+os.register_at_fork(after_in_child=_forget_groq_client)
+
 def get_groq_client():
-    """Get Groq client"""
+    """Get async Groq client backed by a pooled httpx.AsyncClient"""
     global groq_client
     
     if groq_client is not None:
         return groq_client
     
     try:
-        from groq import Groq
+        from groq import AsyncGroq
         import httpx
         
         logger.info(f"🤖 Initializing Groq client with model: {Config.GROQ_MODEL}")
         
-        groq_client = Groq(
+        limits = httpx.Limits(
+            max_connections=Config.GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=Config.GROQ_KEEPALIVE_EXPIRY
+        )
+        groq_client = AsyncGroq(
             api_key=Config.GROQ_API_KEY,
-            http_client=httpx.Client()
+            base_url=Config.GROQ_BASE_URL,
+            timeout=Config.GROQ_TIMEOUT,
+            max_retries=0,  # retries are done by llm_limiter
+            http_client=httpx.AsyncClient(limits=limits, timeout=Config.GROQ_TIMEOUT)
         )
         
-        logger.info("✅ Groq client initialized")
+        logger.info(
+            f"✅ Groq client initialized (pool: {Config.GROQ_MAX_CONNECTIONS} connections, "
+            f"{Config.GROQ_MAX_KEEPALIVE} keep-alive)"
+        )
         return groq_client
         
     except Exception as e:
         logger.error(f"❌ Groq client error: {e}")
         return None
 
+async def summarize_history(previous_summary: str, messages: list) -> str:
+    """Fold older turns into a short rolling summary (used by the context builder)"""
+    client = get_groq_client()
+    if client is None:
+        return ""
+    
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = (
+        f"Previous summary:\n{previous_summary or '(none)'}\n\n"
+        f"New conversation turns:\n{transcript}\n\n"
+        "Update the summary with the important facts, names and requests. Reply with the summary only."
+    )
+    response = await llm_limiter.create(
+        client,
+        priority=PRIORITY_BACKGROUND,
+        tokens=Config.SUMMARY_MAX_TOKENS,
+        messages=[{"role": "user", "content": prompt}],
+        model=Config.GROQ_MODEL,
+        temperature=0,
+        max_tokens=Config.SUMMARY_MAX_TOKENS,
+    )
+    return response.choices[0].message.content
+
+context_builder.summarizer = summarize_history
+
+def _forget_cleared_summary(chat_id):
+    # Another worker changed the chat: after a /clear there the rolling summary is stale
+    if chat_id is None or not storage.load_history(chat_id):
+        context_builder.forget(chat_id)
+
+storage.subscribe('conversations', _forget_cleared_summary)
+
 def format_message_for_telegram(text: str) -> str:
-    """Format AI response for Telegram"""
-    if '```' in text:
-        parts = text.split('```')
-        for i in range(0, len(parts), 2):
-            parts[i] = escape_markdown_v2(parts[i])
-        return '```'.join(parts)
+    """Format AI response for Telegram (model markdown -> MarkdownV2, one pass)"""
+    return to_markdown_v2(text)
+
+async def stream_ai_response(client, messages: list, reply: StreamingReply, model: str, priority: int, tokens: int,
+                             timing: dict) -> str:
+    """Stream the completion into `reply`, one Telegram message edited as tokens arrive (caller finishes it)"""
+    async def consume(stream):
+        async for chunk in stream:
+            if chunk.choices:
+                await reply.feed(chunk.choices[0].delta.content)
+    
+    # The limiter slot is held until the whole stream has been read
+    await llm_limiter.create(
+        client,
+        priority=priority,
+        tokens=tokens,
+        consume=consume,
+        timing=timing,
+        messages=messages,
+        model=model,
+        temperature=Config.TEMPERATURE,
+        max_tokens=Config.MAX_TOKENS,
+        stream=True,
+    )
+    return reply.text
+
+async def complete(client, messages: list, stream, model: str, priority: int, tokens: int) -> str:
+    """One completion from `model`; only the time spent at Groq is reported to the router"""
+    timing = {}
+    if stream is not None:
+        ai_response = await stream_ai_response(client, messages, stream, model, priority, tokens, timing)
+        prompt_tokens, completion_tokens = tokens - Config.MAX_TOKENS, estimate_tokens(ai_response)
     else:
-        return escape_markdown_v2(text)
+        with metrics.timer('groq'):
+            response = await llm_limiter.create(
+                client,
+                priority=priority,
+                tokens=tokens,
+                timing=timing,
+                messages=messages,
+                model=model,
+                temperature=Config.TEMPERATURE,
+                max_tokens=Config.MAX_TOKENS,
+            )
+        ai_response = response.choices[0].message.content
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else tokens - Config.MAX_TOKENS
+        completion_tokens = usage.completion_tokens if usage else estimate_tokens(ai_response)
+    model_router.record_success(model, timing['seconds'], prompt_tokens, completion_tokens)
+    return ai_response
 
-def escape_markdown_v2(text: str) -> str:
-    """Escape Telegram MarkdownV2 characters"""
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
+async def generate_reply(client, messages: list, stream, model: str, priority: int, tokens: int) -> str:
+    """Completion from `model`, retried once on the router's fallback model if it is rate limited or failing.
+
+    With `stream` (a StreamingReply) the answer is shown while it is generated;
+    once part of it is visible there is no fallback. Only Groq errors count
+    against a model's circuit breaker.
+    """
+    try:
+        return await complete(client, messages, stream, model, priority, tokens)
+    except Exception as e:
+        if not model_router.is_model_error(e):
+            raise
+        model_router.record_failure(model, e)
+        fallback = model_router.fallback_for(model)
+        shown = stream is not None and stream.reply is not None
+        if shown or fallback is None or not model_router.should_fallback(e) or not model_router.is_available(fallback, tokens):
+            raise
+        logger.warning(f"🔀 {model} failed ({e.__class__.__name__}), falling back to {fallback}")
+        model_router.record_fallback(model)
+    try:
+        return await complete(client, messages, stream, fallback, priority, tokens)
+    except Exception as e:
+        if model_router.is_model_error(e):
+            model_router.record_failure(fallback, e)
+        raise
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user messages with AI"""
@@ -82,6 +208,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         LoggerService.track_user_request(user_id, update.effective_user.username)
         BotService.update_stats(user_id)
+        activity.record_message(user_id)
     except Exception as e:
         logger.error(f"Error tracking user: {e}")
     
@@ -90,76 +217,104 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You don't have permission to use this bot.")
         return
     
-    # Simple moderation
-    if len(user_message) > Config.MAX_MESSAGE_LENGTH:
-        await update.message.reply_text(f"❌ Message too long (max {Config.MAX_MESSAGE_LENGTH} characters)")
+    # Moderation (length + banned words)
+    allowed, reason = await BotService.moderate_message(user_message)
+    if not allowed:
+        logger.info(f"🛡 Message from {user_id} in chat {chat_id} blocked: {reason}")
+        await update.message.reply_text(f"❌ {reason}")
         return
     
+    # One AI turn per chat at a time (in debounce mode a burst becomes one turn)
+    user_message = await chat_gate.acquire(chat_id, user_message)
+    if user_message is None:
+        logger.info(f"🧩 Message from {user_id} merged into the pending turn for chat {chat_id}")
+        return
+    try:
+        await respond_with_ai(update, client, chat_id, user_message)
+    finally:
+        chat_gate.release(chat_id)
+
+async def respond_with_ai(update: Update, client, chat_id: int, user_message: str):
+    """Append the user turn, get the completion and reply (caller holds the chat's turn)"""
     # Initialize conversation
-    if chat_id not in chat_conversations:
-        chat_conversations[chat_id] = []
+    if chat_id not in conversation_store:
         logger.info(f"📝 Created new conversation for chat {chat_id}")
+    history = conversation_store.get_or_create(chat_id)
     
-    # Add user message
-    chat_conversations[chat_id].append({
+    # Add user message (history is capped at MAX_HISTORY by the store)
+    user_entry = {
         "role": "user",
         "content": user_message
-    })
-    
-    # Limit history
-    if len(chat_conversations[chat_id]) > Config.MAX_HISTORY:
-        chat_conversations[chat_id] = chat_conversations[chat_id][-Config.MAX_HISTORY:]
-        logger.info(f"📚 Trimmed history for chat {chat_id}")
+    }
+    conversation_store.append(chat_id, user_entry)
+    stream = None
     
     try:
         # Show typing indicator
         await update.message.chat.send_action(action="typing")
         
-        # Prepare messages
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful AI assistant. Respond helpfully and concisely. Use markdown for code when appropriate."
-            }
-        ] + chat_conversations[chat_id]
-        
-        logger.info(f"🤖 Sending request to Groq API with model: {Config.GROQ_MODEL}")
+        # Prepare messages (newest turns packed into the token budget)
+        messages, context_info = context_builder.build(
+            chat_id, SYSTEM_PROMPT, history, conversation_store.token_count(chat_id)
+        )
         
-        # Get AI response
-        response = client.chat.completions.create(
-            messages=messages,
-            model=Config.GROQ_MODEL,
-            temperature=Config.TEMPERATURE,
-            max_tokens=Config.MAX_TOKENS,
+        model, route = model_router.choose(chat_id, user_message, context_info['prompt_tokens'])
+        logger.info(
+            f"🤖 Sending request to Groq API with model: {model} ({route}) "
+            f"(~{context_info['prompt_tokens']} prompt tokens, saved {context_info['saved_tokens']}, "
+            f"dropped {context_info['dropped_turns']} turns, summary: {'yes' if context_info['summary'] else 'no'})"
         )
         
-        ai_response = response.choices[0].message.content
-        logger.info(f"✅ Received AI response ({len(ai_response)} chars)")
+        # Get AI response (repeated prompts are answered from the cache)
+        cache_key = response_cache.key_for(model, Config.TEMPERATURE, messages)
+        ai_response = response_cache.get(cache_key)
+        if ai_response is not None:
+            logger.info(f"⚡ Cache hit for chat {chat_id} ({len(ai_response)} chars)")
+        else:
+            # Private chats are admitted before groups when Groq capacity is short
+            priority = PRIORITY_PRIVATE if update.effective_chat.type == 'private' else PRIORITY_GROUP
+            tokens = context_info['prompt_tokens'] + Config.MAX_TOKENS
+            stream = StreamingReply(update.message) if Config.STREAM_RESPONSES else None
+            started = time.perf_counter()
+            ai_response = await generate_reply(client, messages, stream, model, priority, tokens)
+            elapsed = time.perf_counter() - started
+            activity.record_ai_latency(elapsed)
+            if stream is not None:
+                metrics.observe('groq_stream', elapsed)
+            logger.info(f"✅ Received AI response ({len(ai_response)} chars)")
+            response_cache.put(cache_key, ai_response)
         
         # Save AI response
-        chat_conversations[chat_id].append({
+        conversation_store.append(chat_id, {
             "role": "assistant",
             "content": ai_response
         })
+        
+        if stream is not None:
+            await stream.finish()  # final formatted edit (plus extra messages for a long reply)
+            return
 
-        # Format and send
-        try:
-            formatted_message = format_message_for_telegram(ai_response)
-            await update.message.reply_text(
-                formatted_message,
-                parse_mode='MarkdownV2'
-            )
-            logger.info(f"✅ AI response sent to chat {chat_id}")
-        except Exception as e:
-            # Fallback to plain text if markdown fails
-            logger.error(f"Markdown error: {e}, falling back to plain text")
-            await update.message.reply_text(ai_response)
+        # Format and send (split into several messages when over Telegram's limit)
+        with metrics.timer('reply_text'):
+            await send_reply(update.message, ai_response)
+        logger.info(f"✅ AI response sent to chat {chat_id}")
+        
+    except LLMBusyError as e:
+        logger.warning(f"⏳ Groq rate limit persisted for chat {chat_id}: {e}")
+        activity.record_error()
+        conversation_store.pop(chat_id, user_entry)
+        
+        await update.message.reply_text(
+            "⏳ I'm getting a lot of messages right now. Please try again in a minute."
+        )
         
     except Exception as e:
         logger.error(f"❌ Error in AI processing: {e}")
+        activity.record_error()
+        if stream is not None and stream.reply is not None:
+            return  # part of the answer is already shown: keep the turn, no apology under it
         # Remove failed conversation entry
-        if chat_id in chat_conversations and chat_conversations[chat_id]:
-            chat_conversations[chat_id].pop()  # Remove user message
+        conversation_store.pop(chat_id, user_entry)
         
         await update.message.reply_text(
             "❌ Sorry, I encountered an error while processing your message. "
@@ -169,6 +324,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors"""
     logger.error(f"Update error: {context.error}")
+    activity.record_error()
     
     # Log to group if available
     if update and update.effective_user:
@@ -0,0 +1,45 @@
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters
+from handlers.commands import (
+    start, help_command, clear_command, stats_command,
+    mygroup_command, test_log_command, stop_ai_command,
+    start_ai_command, debug_command, payroll_command,
+    perf_command, model_command
+)
+from handlers.messages import handle_message, error_handler
+from services.metrics import metrics
+from services.storage import storage
+from services.chat_gate import chat_gate
+from config import Config
+
+async def sync_shared_state(update: Update, context):
+    """Pick up changes other workers made to shared storage before handling an update"""
+    storage.sync()
+
+def register_handlers(application: Application):
+    """Register all command/message handlers (shared by polling, Flask and ASGI entry points)"""
+    if storage.shared:
+        # Group -1 runs before the handlers below for every update
+        application.add_handler(TypeHandler(Update, sync_shared_state), group=-1)
+    application.add_handler(CommandHandler("start", metrics.instrument("start")(start)))
+    application.add_handler(CommandHandler("help", metrics.instrument("help")(help_command)))
+    application.add_handler(CommandHandler("clear", metrics.instrument("clear")(clear_command)))
+    application.add_handler(CommandHandler("stats", metrics.instrument("stats")(stats_command)))
+    application.add_handler(CommandHandler("myGroup", metrics.instrument("myGroup")(mygroup_command)))
+    application.add_handler(CommandHandler("testlog", metrics.instrument("testlog")(test_log_command)))
+    application.add_handler(CommandHandler("stopAI", metrics.instrument("stopAI")(stop_ai_command)))
+    application.add_handler(CommandHandler("startAI", metrics.instrument("startAI")(start_ai_command)))
+    application.add_handler(CommandHandler("debug", metrics.instrument("debug")(debug_command)))
+    application.add_handler(CommandHandler("payroll", metrics.instrument("payroll")(payroll_command)))
+    application.add_handler(CommandHandler("perf", metrics.instrument("perf")(perf_command)))
+    application.add_handler(CommandHandler("model", metrics.instrument("model")(model_command)))
+    
+    # In debounce mode the handler must not block the update queue, or the rest of a burst could never reach it;
+    # chat_gate tracks the detached turns so shutdown can wait for them
+    application.add_handler(MessageHandler(
+        filters.UpdateType.MESSAGE & filters.TEXT & ~filters.COMMAND,  # edits have no update.message
+        chat_gate.track(metrics.instrument("message")(handle_message)),
+        block=not Config.CHAT_DEBOUNCE
+    ))
+    application.add_error_handler(error_handler)
+    return application
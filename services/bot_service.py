@@ -1,37 +1,68 @@
 """
 Bot Service - Simplified version
 """
+import threading
 import time
+from collections import OrderedDict
 from config import Config
+from services.storage import storage
+from services.moderation import moderation_engine
+from services.user_activity import user_activity
 
-# Statistics
+# Statistics (total_messages survives restarts; uptime is per process)
 bot_start_time = time.time()
-total_messages = 0
-unique_users = set()
+total_messages = storage.load_counter('total_messages')
 
-# AI enabled chats
-ai_enabled_chats = set()
+# AI toggle per chat, loaded lazily from storage: {chat_id: bool}, least recently used first.
+# Bounded because the update filter looks up every group that writes to the bot. The lock is
+# needed because the Flask prefilter reads it on request threads while handlers write it.
+AI_CHATS_CACHE_SIZE = 10000
+ai_enabled_chats = OrderedDict()
+ai_enabled_lock = threading.Lock()
+
+def _forget_ai_setting(chat_id):
+    # Another worker toggled AI (None: anything may have changed)
+    with ai_enabled_lock:
+        if chat_id is None:
+            ai_enabled_chats.clear()
+        else:
+            ai_enabled_chats.pop(chat_id, None)
+
+def _cache_ai_setting(chat_id, enabled: bool, loaded: bool = False):
+    with ai_enabled_lock:
+        if loaded and chat_id in ai_enabled_chats:
+            # /startAI or /stopAI ran while we read storage: theirs is newer
+            enabled = ai_enabled_chats[chat_id]
+        ai_enabled_chats[chat_id] = enabled
+        ai_enabled_chats.move_to_end(chat_id)
+        while len(ai_enabled_chats) > AI_CHATS_CACHE_SIZE:
+            ai_enabled_chats.popitem(last=False)  # still in storage, reloaded on the next lookup
+    return enabled
+
+storage.subscribe('ai_chats', _forget_ai_setting)
 
 class BotService:
     @staticmethod
     def update_stats(user_id):
         """Update bot statistics"""
-        global total_messages, unique_users
-        total_messages += 1
-        unique_users.add(user_id)
+        global total_messages
+        # Atomic across workers when storage is shared
+        total_messages = storage.increment_counter('total_messages')
     
     @staticmethod
     def get_stats():
         """Get bot statistics"""
-        global total_messages, unique_users, bot_start_time
+        global total_messages, bot_start_time
         
+        if storage.shared:
+            total_messages = storage.load_counter('total_messages')  # includes the other workers
         uptime = time.time() - bot_start_time
         hours = int(uptime // 3600)
         minutes = int((uptime % 3600) // 60)
         
         return {
             'total_messages': total_messages,
-            'unique_users': len(unique_users),
+            'unique_users': user_activity.unique_users(),
             'uptime': f'{hours}h {minutes}m'
         }
     
@@ -42,10 +73,9 @@ class BotService:
         if len(message) > Config.MAX_MESSAGE_LENGTH:
             return False, f"Message too long (max {Config.MAX_MESSAGE_LENGTH} characters)"
         
-        # Check for banned words
-        for word in Config.BANNED_WORDS:
-            if word and word in message.lower():
-                return False, "Message contains inappropriate content"
+        # Check for banned words (one compiled pattern, one pass over the message)
+        if moderation_engine.find(message):
+            return False, "Message contains inappropriate content"
         
         return True, ""
     
@@ -60,15 +90,21 @@ class BotService:
     @staticmethod
     def is_ai_enabled(chat_id):
         """Check if AI is enabled for chat"""
-        return chat_id in ai_enabled_chats
+        with ai_enabled_lock:
+            enabled = ai_enabled_chats.get(chat_id)
+            if enabled is not None:
+                ai_enabled_chats.move_to_end(chat_id)
+                return enabled
+        return _cache_ai_setting(chat_id, bool(storage.load_ai_enabled(chat_id)), loaded=True)
     
     @staticmethod
     def enable_ai(chat_id):
         """Enable AI for chat"""
-        ai_enabled_chats.add(chat_id)
+        _cache_ai_setting(chat_id, True)
+        storage.save_ai_enabled(chat_id, True)
     
     @staticmethod
     def disable_ai(chat_id):
         """Disable AI for chat"""
-        if chat_id in ai_enabled_chats:
-            ai_enabled_chats.remove(chat_id)
\ No newline at end of file
+        _cache_ai_setting(chat_id, False)
+        storage.save_ai_enabled(chat_id, False)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Chat Gate - one AI turn at a time per chat, with optional message coalescing
+"""
+import asyncio
+import functools
+import time
+from config import Config
+
+
+class _ChatSlot:
+    __slots__ = ('lock', 'users', 'batch', 'collecting')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0          # turns holding or waiting for this slot
+        self.batch = []         # texts collected for the next turn (debounce mode)
+        self.collecting = False
+
+
+class ChatGate:
+    """Serialize AI turns per chat so history is never read and appended concurrently.
+
+    Slots exist only while a chat has a turn running or waiting, so idle chats
+    cost nothing. With `debounce` > 0 the first message of a burst waits until
+    the chat has been quiet for `debounce` seconds (at most `max_wait`) and
+    for the previous turn to finish; messages arriving meanwhile are merged
+    into its prompt and their own turns return None. Handlers wrapped with
+    `track` run detached from the update queue in that mode, so shutdown
+    waits for them with `drain`.
+    """
+
+    def __init__(self, debounce=None, max_wait=None):
+        self.debounce = Config.CHAT_DEBOUNCE if debounce is None else debounce
+        self.max_wait = Config.CHAT_DEBOUNCE_MAX if max_wait is None else max_wait
+        self.slots = {}  # {chat_id: _ChatSlot}
+        self.stats = {'turns': 0, 'waited': 0, 'coalesced': 0}
+        self.tasks = set()  # running handlers wrapped with track()
+
+    def track(self, callback):
+        """Wrap a handler so `drain` can wait for it"""
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            task = asyncio.current_task()
+            self.tasks.add(task)
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                self.tasks.discard(task)
+        return wrapper
+
+    async def drain(self, timeout: float) -> int:
+        """Wait for tracked handlers to finish; returns how many are still running"""
+        await asyncio.sleep(0)  # let handler tasks created just now start
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=timeout)
+        return len(self.tasks)
+
+    async def acquire(self, chat_id, text: str):
+        """Wait for the chat's turn; returns the (merged) text, or None if merged into another turn"""
+        slot = self.slots.get(chat_id)
+        if slot is None:
+            slot = self.slots[chat_id] = _ChatSlot()
+        slot.users += 1
+
+        if not self.debounce:
+            if slot.lock.locked():
+                self.stats['waited'] += 1
+            try:
+                await slot.lock.acquire()
+            except BaseException:
+                self._leave(chat_id, slot)
+                raise
+            self.stats['turns'] += 1
+            return text
+
+        slot.batch.append(text)
+        if slot.collecting:
+            self.stats['coalesced'] += 1
+            self._leave(chat_id, slot)
+            return None
+
+        slot.collecting = True
+        try:
+            started = time.monotonic()
+            seen = len(slot.batch)
+            while True:
+                await asyncio.sleep(self.debounce)
+                if len(slot.batch) == seen or time.monotonic() - started >= self.max_wait:
+                    break
+                seen = len(slot.batch)
+            if slot.lock.locked():
+                self.stats['waited'] += 1
+            await slot.lock.acquire()  # keep absorbing messages while the previous turn runs
+        except BaseException:
+            slot.collecting = False
+            self._leave(chat_id, slot)
+            raise
+        slot.collecting = False
+        texts, slot.batch = slot.batch, []
+        self.stats['turns'] += 1
+        return "\n".join(texts)
+
+    def release(self, chat_id):
+        """End the chat's current turn"""
+        slot = self.slots[chat_id]
+        slot.lock.release()
+        self._leave(chat_id, slot)
+
+    def _leave(self, chat_id, slot):
+        slot.users -= 1
+        if slot.users == 0:
+            del self.slots[chat_id]
+
+    def get_stats(self):
+        return dict(self.stats, active_chats=len(self.slots), running=len(self.tasks), debounce=self.debounce)
+
+
+# Shared gate used by handle_message
+chat_gate = ChatGate()
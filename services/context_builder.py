@@ -0,0 +1,157 @@
+"""
+Context Builder - packs chat history into a prompt token budget
+"""
+import asyncio
+import functools
+import logging
+from collections import OrderedDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role / separators per chat message
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 UTF-8 bytes per token; Khmer is 3 bytes per character)"""
+    if not text:
+        return 0
+    return len(text.encode('utf-8')) // 4 + 1
+
+
+@functools.lru_cache(maxsize=8192)
+def _content_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def message_tokens(message: dict) -> int:
+    """Token estimate for a history entry, cached by content (the entry itself is persisted and left untouched)"""
+    content = message.get('content')
+    return _content_tokens(content) if content else MESSAGE_OVERHEAD_TOKENS
+
+
+def _api_message(message: dict) -> dict:
+    return {"role": message["role"], "content": message["content"]}
+
+
+def _fingerprint(message: dict):
+    return message["role"], hash(message.get("content"))
+
+
+class ContextBuilder:
+    """Build the message list sent to the LLM.
+
+    The newest turns are packed into `token_budget`; the newest user message
+    is always kept. With `use_summary`, turns that fall outside the budget are
+    folded into a per-chat rolling summary by `summarizer` (an async
+    callable `(previous_summary, messages) -> str`) in the background, and
+    the cached summary is sent in their place.
+    """
+
+    def __init__(self, token_budget=None, use_summary=None, summarizer=None, max_summaries=None):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.use_summary = Config.CONTEXT_SUMMARY if use_summary is None else use_summary
+        self.summarizer = summarizer
+        self.max_summaries = max_summaries or Config.MAX_CONVERSATIONS
+        self.summaries = OrderedDict()  # {chat_id: {"text": str, "last": fingerprint, "tokens": int}}
+        self.summarizing = set()
+        self.tasks = set()
+        self.stats = {'requests': 0, 'tokens_sent': 0, 'tokens_saved': 0, 'summaries': 0}
+
+    def forget(self, chat_id):
+        """Drop the cached summary for a chat (e.g. after /clear); None drops all"""
+        if chat_id is None:
+            self.summaries.clear()
+        else:
+            self.summaries.pop(chat_id, None)
+
+    def build(self, chat_id, system_prompt: str, history, history_tokens: int = None):
+        """Return (messages, info) for the completion request"""
+        entries = list(history)
+        if history_tokens is None:
+            history_tokens = sum(message_tokens(m) for m in entries)
+
+        summary = self.summaries.get(chat_id) if self.use_summary else None
+        budget = self.token_budget - (summary["tokens"] if summary else 0)
+
+        if history_tokens <= self.token_budget:
+            # Fast path: everything fits, no summary needed
+            kept, dropped, summary = entries, [], None
+            sent_tokens = history_tokens
+        else:
+            sent_tokens = 0
+            start = len(entries)
+            for message in reversed(entries):
+                tokens = message_tokens(message)
+                if sent_tokens + tokens > budget and start < len(entries):
+                    break
+                sent_tokens += tokens
+                start -= 1
+            kept, dropped = entries[start:], entries[:start]
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary['text']}"})
+            sent_tokens += summary["tokens"]
+        messages.extend(_api_message(m) for m in kept)
+
+        if dropped and self.use_summary:
+            self._schedule_summary(chat_id, dropped)
+
+        saved = max(0, history_tokens - sent_tokens)
+        self.stats['requests'] += 1
+        self.stats['tokens_sent'] += sent_tokens
+        self.stats['tokens_saved'] += saved
+        info = {
+            'history_tokens': history_tokens,
+            'prompt_tokens': sent_tokens + estimate_tokens(system_prompt),
+            'saved_tokens': saved,
+            'dropped_turns': len(dropped),
+            'summary': bool(summary)
+        }
+        return messages, info
+
+    def _schedule_summary(self, chat_id, dropped):
+        """Fold newly dropped turns into the chat's summary in the background"""
+        if self.summarizer is None or chat_id in self.summarizing:
+            return
+        summary = self.summaries.get(chat_id)
+        new_turns = dropped
+        if summary:
+            marks = [_fingerprint(m) for m in dropped]
+            if summary["last"] in marks:
+                new_turns = dropped[marks.index(summary["last"]) + 1:]
+        if not new_turns:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.summarizing.add(chat_id)
+        task = loop.create_task(self._summarize(chat_id, summary["text"] if summary else "", new_turns))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _summarize(self, chat_id, previous, turns):
+        try:
+            text = await self.summarizer(previous, [_api_message(m) for m in turns])
+            if text:
+                self.summaries[chat_id] = {
+                    "text": text,
+                    "last": _fingerprint(turns[-1]),
+                    "tokens": estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+                }
+                self.summaries.move_to_end(chat_id)
+                while len(self.summaries) > self.max_summaries:
+                    self.summaries.popitem(last=False)
+                self.stats['summaries'] += 1
+                logger.info(f"🗜 Updated rolling summary for chat {chat_id} ({len(turns)} turns folded in)")
+        except Exception as e:
+            logger.error(f"❌ Summary failed for chat {chat_id}: {e}")
+        finally:
+            self.summarizing.discard(chat_id)
+
+
+# Shared builder; handlers/messages.py installs the LLM summarizer
+context_builder = ContextBuilder()
@@ -0,0 +1,234 @@
+"""
+Conversation Store - bounded per-chat history with LRU/TTL eviction
+
+Histories are read through the persistence layer: a chat that is not in
+memory is loaded lazily on first access, and every change is handed to the
+storage write-behind queue. Evicting a chat only frees memory. With shared
+storage, appends are atomic read-modify-writes, and chats changed by other
+workers are dropped from memory and reloaded on next access.
+"""
+import sys
+import time
+from collections import OrderedDict, deque
+from config import Config
+from services.storage import storage as default_storage
+from services.context_builder import message_tokens
+
+
+class _Conversation:
+    __slots__ = ('messages', 'size', 'tokens', 'last_access')
+
+    def __init__(self, max_history):
+        self.messages = deque(maxlen=max_history)
+        self.size = 0
+        self.tokens = 0  # running token estimate of the whole history
+        self.last_access = time.monotonic()
+
+
+def _message_size(message):
+    """Approximate memory held by one history entry"""
+    return sys.getsizeof(message.get('content') or '') + 64
+
+
+def _without(messages, message):
+    """`messages` minus the newest entry equal to `message` (role and content)"""
+    messages = list(messages or [])
+    for index in range(len(messages) - 1, -1, -1):
+        entry = messages[index]
+        if entry.get('role') == message.get('role') and entry.get('content') == message.get('content'):
+            del messages[index]
+            break
+    return messages
+
+
+class ConversationStore:
+    """Chat histories capped per chat (deque maxlen) and globally.
+
+    Chats are kept in least-recently-used order; idle chats older than
+    `ttl` seconds are dropped, and the oldest chats are evicted when either
+    `max_chats` or the `memory_budget` (bytes) is exceeded.
+    """
+
+    def __init__(self, max_history=None, max_chats=None, ttl=None, memory_budget=None, storage=None):
+        self.max_history = max_history or Config.MAX_HISTORY
+        self.max_chats = max_chats or Config.MAX_CONVERSATIONS
+        self.ttl = ttl if ttl is not None else Config.CONVERSATION_TTL
+        self.memory_budget = memory_budget or Config.CONVERSATION_MEMORY_MB * 1024 * 1024
+        self.storage = storage
+        self._chats = OrderedDict()  # {chat_id: _Conversation}, oldest access first
+        self.total_size = 0
+        self.stats = {'hits': 0, 'misses': 0, 'loads': 0, 'evicted_lru': 0, 'evicted_ttl': 0, 'evicted_memory': 0}
+        if storage is not None:
+            storage.subscribe('conversations', self._invalidate)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._chats
+
+    def __len__(self):
+        return len(self._chats)
+
+    def _touch(self, chat_id):
+        conv = self._chats.get(chat_id)
+        if conv is None:
+            self.stats['misses'] += 1
+            return self._load(chat_id)
+        self.stats['hits'] += 1
+        conv.last_access = time.monotonic()
+        self._chats.move_to_end(chat_id)
+        return conv
+
+    def _load(self, chat_id):
+        """Hydrate one chat from storage (lazy, on first access)"""
+        if self.storage is None:
+            return None
+        saved = self.storage.load_history(chat_id)
+        if not saved:
+            return None
+        self.stats['loads'] += 1
+        self.evict_idle()
+        conv = self._chats[chat_id] = _Conversation(self.max_history)
+        self._refill(conv, saved)
+        self._enforce_limits()
+        return conv
+
+    def _refill(self, conv, messages):
+        """Replace a chat's messages in place (callers may hold the deque)"""
+        self.total_size -= conv.size
+        conv.messages.clear()
+        conv.messages.extend(messages)
+        conv.size = sum(_message_size(m) for m in conv.messages)
+        conv.tokens = sum(message_tokens(m) for m in conv.messages)
+        self.total_size += conv.size
+
+    def _invalidate(self, chat_id):
+        # Another worker changed this chat (None: anything may have changed)
+        for stale in list(self._chats) if chat_id is None else [chat_id]:
+            self._drop(stale)
+
+    def _persist(self, chat_id, conv):
+        if self.storage is not None:
+            self.storage.save_history(chat_id, list(conv.messages))
+
+    def get(self, chat_id):
+        """History deque for a chat, or None"""
+        conv = self._touch(chat_id)
+        return conv.messages if conv else None
+
+    def get_or_create(self, chat_id):
+        """History deque for a chat, creating an empty one if needed"""
+        conv = self._touch(chat_id)
+        if conv is None:
+            self.evict_idle()
+            conv = self._chats[chat_id] = _Conversation(self.max_history)
+            self._enforce_limits()
+        return conv.messages
+
+    def append(self, chat_id, message: dict):
+        """Add a message; the oldest one falls off once MAX_HISTORY is reached"""
+        self.get_or_create(chat_id)
+        conv = self._chats[chat_id]
+        if self.storage is not None and self.storage.shared:
+            # Append to the stored history, which may hold turns from other workers
+            saved = self.storage.update(
+                'conversations', chat_id, lambda messages: ((messages or []) + [message])[-self.max_history:]
+            )
+            self._refill(conv, saved)
+            self._enforce_limits()
+            return
+        if len(conv.messages) == conv.messages.maxlen:
+            oldest = conv.messages[0]
+            dropped = _message_size(oldest)
+            conv.size -= dropped
+            conv.tokens -= message_tokens(oldest)
+            self.total_size -= dropped
+        conv.messages.append(message)
+        size = _message_size(message)
+        conv.size += size
+        conv.tokens += message_tokens(message)
+        self.total_size += size
+        self._persist(chat_id, conv)
+        self._enforce_limits()
+
+    def pop(self, chat_id, message: dict = None):
+        """Remove `message` (or the newest message) from a chat's history"""
+        conv = self._chats.get(chat_id)
+        if not conv or not conv.messages:
+            return None
+        if message is None:
+            message = conv.messages.pop()
+        else:
+            # Match by identity: another turn may hold an equal dict
+            for index, entry in enumerate(conv.messages):
+                if entry is message:
+                    del conv.messages[index]
+                    break
+            else:
+                return None
+        size = _message_size(message)
+        conv.size -= size
+        conv.tokens -= message_tokens(message)
+        self.total_size -= size
+        if self.storage is not None and self.storage.shared:
+            self.storage.update('conversations', chat_id, lambda messages: _without(messages, message))
+        else:
+            self._persist(chat_id, conv)
+        return message
+
+    def count(self, chat_id) -> int:
+        """Number of stored messages for a chat (does not count as an access)"""
+        conv = self._chats.get(chat_id)
+        if conv is None and self.storage is not None:
+            return len(self.storage.load_history(chat_id) or [])
+        return len(conv.messages) if conv else 0
+
+    def token_count(self, chat_id) -> int:
+        """Running token estimate of a chat's history"""
+        conv = self._chats.get(chat_id)
+        return conv.tokens if conv else 0
+
+    def clear(self, chat_id):
+        """Reset a chat's history"""
+        self._drop(chat_id)
+        conv = self._chats[chat_id] = _Conversation(self.max_history)
+        self._persist(chat_id, conv)
+
+    def _drop(self, chat_id):
+        conv = self._chats.pop(chat_id, None)
+        if conv:
+            self.total_size -= conv.size
+
+    def evict_idle(self):
+        """Drop chats idle for longer than the TTL (oldest first, stops at the first fresh one)"""
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._chats:
+            chat_id, conv = next(iter(self._chats.items()))
+            if conv.last_access > cutoff:
+                break
+            self._drop(chat_id)
+            self.stats['evicted_ttl'] += 1
+
+    def _enforce_limits(self):
+        # Never evict the chat that was just touched (it is last in order)
+        while len(self._chats) > self.max_chats:
+            self._drop(next(iter(self._chats)))
+            self.stats['evicted_lru'] += 1
+        while self.total_size > self.memory_budget and len(self._chats) > 1:
+            self._drop(next(iter(self._chats)))
+            self.stats['evicted_memory'] += 1
+
+    def get_stats(self):
+        """Size, hit-rate and eviction counters"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(
+            self.stats,
+            chats=len(self._chats),
+            memory_kb=self.total_size // 1024,
+            hit_rate=self.stats['hits'] / lookups if lookups else 0.0,
+            evictions=self.stats['evicted_lru'] + self.stats['evicted_ttl'] + self.stats['evicted_memory']
+        )
+
+
+# Shared store used by the command and message handlers
+conversation_store = ConversationStore(storage=default_storage)
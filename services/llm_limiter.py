@@ -0,0 +1,216 @@
+"""
+LLM Limiter - admission control for Groq completion calls
+
+Every completion goes through one controller: at most LLM_MAX_IN_FLIGHT calls
+run at once, waiters are admitted by priority (private chats before groups
+before background summaries), the request/token budget reported in Groq's
+x-ratelimit-* headers is respected before sending, and 429/5xx/connection
+errors are retried with jittered exponential backoff.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from config import Config
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_PRIVATE = 0
+PRIORITY_GROUP = 1
+PRIORITY_BACKGROUND = 2
+
+_DURATION_PART = re.compile(r'([\d.]+)(ms|h|m|s)')
+_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+
+
+def parse_duration(value) -> float:
+    """Groq reset header ("1m2.5s", "450ms", "7.66s") or Retry-After ("3") -> seconds"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return sum(float(number) * _UNITS[unit] for number, unit in _DURATION_PART.findall(value))
+
+
+class LLMBusyError(Exception):
+    """Groq kept answering 429 after every retry"""
+
+
+class _Budget:
+    """Request/token budget of one model, from its latest response headers (None = unknown)"""
+    __slots__ = ('remaining_requests', 'remaining_tokens', 'requests_reset_at', 'tokens_reset_at', 'paused_until')
+
+    def __init__(self):
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.paused_until = 0.0  # Retry-After of the last 429, applies to every caller of the model
+
+    def delay(self, tokens: int) -> float:
+        """Seconds to wait before the budget can take this request"""
+        now = time.monotonic()
+        delay = self.paused_until - now
+        if self.remaining_requests is not None and self.remaining_requests < 1:
+            delay = max(delay, self.requests_reset_at - now)
+        if self.remaining_tokens is not None and self.remaining_tokens < tokens:
+            delay = max(delay, self.tokens_reset_at - now)
+        return delay
+
+    def spend(self, tokens: int):
+        # Count this call against the budget before its headers come back
+        if self.remaining_requests is not None:
+            self.remaining_requests = max(0, self.remaining_requests - 1)
+        if self.remaining_tokens is not None:
+            self.remaining_tokens = max(0, self.remaining_tokens - tokens)
+
+    def update(self, headers):
+        """Read x-ratelimit-* headers from a Groq response"""
+        now = time.monotonic()
+        requests = headers.get('x-ratelimit-remaining-requests')
+        tokens = headers.get('x-ratelimit-remaining-tokens')
+        if requests is not None:
+            self.remaining_requests = int(requests)
+            self.requests_reset_at = now + parse_duration(headers.get('x-ratelimit-reset-requests'))
+        if tokens is not None:
+            self.remaining_tokens = int(tokens)
+            self.tokens_reset_at = now + parse_duration(headers.get('x-ratelimit-reset-tokens'))
+
+
+class LLMLimiter:
+    """Priority admission, header-driven budget and retries around completion calls.
+
+    Groq quotas are per model, so each model has its own budget while the
+    in-flight limit is shared.
+    """
+
+    def __init__(self, max_in_flight=None, max_retries=None, retry_base=None, retry_max=None):
+        self.max_in_flight = max_in_flight or Config.LLM_MAX_IN_FLIGHT
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base = retry_base or Config.LLM_RETRY_BASE
+        self.retry_max = retry_max or Config.LLM_RETRY_MAX
+        self.in_flight = 0
+        self.waiters = []  # heap of (priority, seq, future)
+        self.sequence = itertools.count()
+        self.budgets = {}  # {model: _Budget}
+        self.stats = {'calls': 0, 'queued': 0, 'retries': 0, 'rate_limited': 0, 'failed': 0, 'budget_waits': 0}
+
+    async def _acquire(self, priority: int):
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            return
+        self.stats['queued'] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        try:
+            await future  # the releasing call hands its slot over
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def budget(self, model) -> _Budget:
+        budget = self.budgets.get(model)
+        if budget is None:
+            budget = self.budgets[model] = _Budget()
+        return budget
+
+    def _retry_delay(self, error, attempt: int, budget: _Budget):
+        """(backoff, rate_limited) for a retryable error; backoff is None if the error is final"""
+        import groq
+
+        if isinstance(error, groq.RateLimitError):
+            self.stats['rate_limited'] += 1
+            metrics.inc('llm_retries', 'rate_limited')
+            retry_after = parse_duration(error.response.headers.get('retry-after'))
+            if retry_after:
+                budget.paused_until = max(budget.paused_until, time.monotonic() + retry_after)
+                return min(retry_after, self.retry_max) + random.uniform(0, self.retry_base), True
+            return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt)), True
+        elif isinstance(error, groq.APIStatusError) and error.status_code >= 500:
+            metrics.inc('llm_retries', 'server_error')
+        elif isinstance(error, groq.APIConnectionError):
+            metrics.inc('llm_retries', 'connection')
+        else:
+            return None, False
+        # Full jitter: uniform over [0, base * 2^attempt]
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt)), False
+
+    async def run(self, call, priority: int = PRIORITY_GROUP, tokens: int = 0, consume=None, model=None, timing=None):
+        """Admit `call()` (returns a raw Groq response), retrying on 429/5xx.
+
+        The parsed result is returned; with `consume`, `await consume(result)`
+        runs while the slot is still held (streams) and its result is returned.
+        Only `call()` is retried, never `consume`. With a `timing` dict,
+        timing['seconds'] is set to how long the successful call took at Groq
+        (no queue, budget or backoff waits; for streams, until the response
+        started).
+        """
+        self.stats['calls'] += 1
+        budget = self.budget(model)
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            await self._acquire(priority)
+            try:
+                delay = min(budget.delay(tokens), self.retry_max)
+                if delay > 0:
+                    self.stats['budget_waits'] += 1
+                    logger.info(f"⏳ Groq budget exhausted, holding request for {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                metrics.observe('llm_queue_wait', time.perf_counter() - started)
+                budget.spend(tokens)
+                call_started = time.perf_counter()
+                try:
+                    raw = await call()
+                except Exception as e:
+                    backoff, rate_limited = self._retry_delay(e, attempt, budget)
+                    if backoff is None or attempt == self.max_retries:
+                        self.stats['failed'] += 1
+                        if rate_limited:
+                            raise LLMBusyError(str(e)) from e
+                        raise
+                    logger.warning(f"🔁 Groq call failed ({e.__class__.__name__}), retry {attempt + 1} in {backoff:.1f}s")
+                else:
+                    budget.update(raw.headers)
+                    result = await raw.parse()
+                    if timing is not None:
+                        timing['seconds'] = time.perf_counter() - call_started
+                    return await consume(result) if consume is not None else result
+            finally:
+                self._release()
+            self.stats['retries'] += 1
+            await asyncio.sleep(backoff)
+
+    async def create(self, client, priority: int = PRIORITY_GROUP, tokens: int = 0, consume=None, timing=None, **params):
+        """client.chat.completions.create(**params) under admission control"""
+        return await self.run(
+            lambda: client.chat.completions.with_raw_response.create(**params),
+            priority=priority, tokens=tokens, consume=consume, model=params.get('model'), timing=timing
+        )
+
+    def get_stats(self):
+        stats = dict(self.stats, in_flight=self.in_flight, waiting=len(self.waiters))
+        for model, budget in self.budgets.items():
+            if budget.remaining_requests is not None:
+                stats[f'{model}:remaining_requests'] = budget.remaining_requests
+            if budget.remaining_tokens is not None:
+                stats[f'{model}:remaining_tokens'] = budget.remaining_tokens
+        return stats
+
+
+# Shared controller for every Groq completion
+llm_limiter = LLMLimiter()
+metrics.register_gauge('llm_limiter', 'Groq admission controller state', llm_limiter.get_stats)
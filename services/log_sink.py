@@ -0,0 +1,129 @@
+"""
+Log Sink - batched, rate-limited delivery of log messages to LOG_GROUP_ID
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from telegram.error import BadRequest, RetryAfter
+from config import Config
+from services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_TEXT_LIMIT = 4096
+SEPARATOR = "\n\n────────────\n\n"
+
+
+class LogSink:
+    """Queue log events and ship them to the log group in the background.
+
+    `enqueue` never touches the network. A background task waits one flush
+    window after the first queued event, packs everything queued into as few
+    messages as fit Telegram's 4096-character limit, and sends them through a
+    token bucket (Telegram allows about 20 messages per minute in a group).
+    429 answers are retried by the bot's send limiter; if it gives up the
+    message is counted as failed and the bucket pauses for `retry_after`.
+    When the queue is full the oldest events are dropped.
+    """
+
+    def __init__(self, flush_interval=None, max_queue=None, per_minute=None):
+        self.flush_interval = Config.LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_queue = max_queue or Config.LOG_QUEUE_SIZE
+        self.bucket = TokenBucket((per_minute or Config.LOG_RATE_PER_MINUTE) / 60, capacity=3)
+        self.queue = deque()
+        self.bot = None
+        self.task = None
+        self.wakeup = None
+        self.stats = {'queued': 0, 'dropped': 0, 'sent_events': 0, 'sent_messages': 0, 'rate_limited': 0, 'failed': 0}
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The worker task ran on the parent's loop; a forked process starts its own on the next event
+        self.task = None
+        self.wakeup = None
+        self.bot = None
+
+    def enqueue(self, bot, text: str):
+        """Queue one log event (non-blocking)"""
+        self.bot = bot
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.stats['dropped'] += 1
+        self.queue.append(text)
+        self.stats['queued'] += 1
+        self._ensure_worker()
+        self.wakeup.set()
+
+    def _ensure_worker(self):
+        if self.task is not None and not self.task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            # Coalesce everything that arrives during the flush window
+            await asyncio.sleep(self.flush_interval)
+            self.wakeup.clear()
+            await self.flush()
+
+    def _pack(self):
+        """Take queued events and join them into messages within the size limit"""
+        batches = []
+        current, count = "", 0
+        while self.queue:
+            event = self.queue.popleft()
+            if len(event) > TELEGRAM_TEXT_LIMIT:
+                event = event[:TELEGRAM_TEXT_LIMIT - 3] + "..."
+            candidate = event if not current else current + SEPARATOR + event
+            if len(candidate) > TELEGRAM_TEXT_LIMIT:
+                batches.append((current, count))
+                current, count = event, 1
+            else:
+                current, count = candidate, count + 1
+        if current:
+            batches.append((current, count))
+        return batches
+
+    async def flush(self):
+        """Send everything queued now"""
+        if not self.queue or self.bot is None:
+            return
+        for text, count in self._pack():
+            await self._send(text, count)
+
+    async def _send(self, text: str, count: int):
+        parse_mode = 'HTML'
+        for _ in range(2):  # HTML, then plain text
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=Config.LOG_GROUP_ID, text=text, parse_mode=parse_mode)
+                self.stats['sent_messages'] += 1
+                self.stats['sent_events'] += count
+                return
+            except RetryAfter as e:
+                # Still flood limited after the send limiter's retries: hold the next messages back
+                self.stats['rate_limited'] += 1
+                self.bucket.block(e.retry_after)
+                logger.warning(f"⏳ Log group still rate limited, pausing for {e.retry_after}s")
+                break
+            except BadRequest as e:
+                if parse_mode is None:
+                    break
+                # Truncation can cut an HTML tag in half; resend as plain text
+                logger.warning(f"Log message rejected ({e}), resending as plain text")
+                parse_mode = None
+            except Exception as e:
+                logger.error(f"Failed to log to group: {e}")
+                break
+        self.stats['failed'] += count
+
+    def get_stats(self):
+        return dict(self.stats, pending=len(self.queue))
+
+
+# Shared sink used by LoggerService
+log_sink = LogSink()
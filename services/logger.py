@@ -1,6 +1,11 @@
+import asyncio
 import logging
 from datetime import datetime
+from types import SimpleNamespace
 from config import Config
+from services.user_activity import user_activity
+from services.log_sink import log_sink
+from services.reporting import activity
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -11,12 +16,12 @@ logger = logging.getLogger(__name__)
 class LoggerService:
     """Logging service for bot operations"""
     
-    # Track user activity
-    user_activity = {}  # {user_id: {"username": "...", "requests": 0, "last_active": datetime}}
+    # Track user activity (bounded in-memory table over storage, see services/user_activity.py)
+    user_activity = user_activity
     
     @staticmethod
     async def log_to_group(context, message: str, log_type: str = "INFO"):
-        """Send log messages to designated log group"""
+        """Queue a log message for the designated log group (sent in batches in the background)"""
         if not Config.LOG_GROUP_ID:
             logger.warning("LOG_GROUP_ID not set")
             return
@@ -24,11 +29,7 @@ class LoggerService:
         try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             log_message = f"🤖 [{log_type}] {timestamp}\n\n{message}"
-            await context.bot.send_message(
-                chat_id=Config.LOG_GROUP_ID,
-                text=log_message,
-                parse_mode='HTML'
-            )
+            log_sink.enqueue(context.bot, log_message)
         except Exception as e:
             logger.error(f"Failed to log to group: {e}")
     
@@ -61,16 +62,47 @@ class LoggerService:
         message += f"Error: {error_msg}"
         await LoggerService.log_to_group(context, message, "ERROR")
     
+    @staticmethod
+    async def send_periodic_report(context):
+        """Send the activity report for the last window (skipped when nothing happened)"""
+        report = activity.snapshot()
+        if not report['messages'] and not report['errors']:
+            logger.info("📊 No activity in the last window, skipping report")
+            return False
+        
+        def fmt(seconds):
+            return f"{seconds:.2f}s" if seconds is not None else "n/a"
+        
+        minutes = report['window'] // 60
+        message = (
+            f"📊 <b>Activity Report</b> (last {minutes} min)\n"
+            f"📨 Messages: {report['messages']}\n"
+            f"👥 Active users: {report['active_users']}\n"
+            f"🤖 AI replies: {report['ai_calls']}\n"
+            f"⏱ AI latency: p50 {fmt(report['latency_p50'])} | p95 {fmt(report['latency_p95'])} | "
+            f"p99 {fmt(report['latency_p99'])}\n"
+            f"❌ Errors: {report['errors']}"
+        )
+        await LoggerService.log_to_group(context, message, "REPORT")
+        return True
+    
+    @staticmethod
+    async def periodic_report_task(bot, interval: int = None, initial_delay: float = 10):
+        """Background task sending a report every REPORT_INTERVAL seconds (polling and webhook modes)"""
+        interval = interval or Config.REPORT_INTERVAL
+        if not interval:
+            return
+        context = SimpleNamespace(bot=bot)
+        await asyncio.sleep(initial_delay)
+        logger.info(f"📊 Periodic reports every {interval}s")
+        while True:
+            try:
+                await LoggerService.send_periodic_report(context)
+            except Exception as e:
+                logger.error(f"Error in periodic report: {e}")
+            await asyncio.sleep(interval)
+    
     @staticmethod
     def track_user_request(user_id: int, username: str):
         """Track user requests for statistics"""
-        if user_id not in LoggerService.user_activity:
-            LoggerService.user_activity[user_id] = {
-                "username": username,
-                "requests": 0,
-                "last_active": datetime.now()
-            }
-        
-        LoggerService.user_activity[user_id]["requests"] += 1
-        LoggerService.user_activity[user_id]["last_active"] = datetime.now()
-        LoggerService.user_activity[user_id]["username"] = username  # Update in case it changed
\ No newline at end of file
+        LoggerService.user_activity.touch(user_id, username)
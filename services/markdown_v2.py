@@ -0,0 +1,115 @@
+"""
+MarkdownV2 - convert model markdown into valid Telegram MarkdownV2 in one pass
+
+One precompiled tokenizer walks the text once; code fences, inline code,
+links, bold/italic/strikethrough, headings and bullets become their
+MarkdownV2 form and the text between tokens is escaped from a precomputed
+table. Anything that does not form a complete token is escaped as plain text, so the output always parses (an unterminated code fence, e.g.
+from a truncated reply, is closed).
+"""
+import re
+
+# Characters that must be escaped outside entities (backslash first)
+_SPECIAL = '\\_*[]()~`>#+-=|{}.!'
+_ESCAPES_TEXT = tuple((char, '\\' + char) for char in _SPECIAL)
+# Inside code/pre only ` and \ are special; inside a link URL only ) and \
+_ESCAPES_CODE = (('\\', '\\\\'), ('`', '\\`'))
+_ESCAPES_URL = (('\\', '\\\\'), (')', '\\)'))
+
+# Inline tokens can only start at one of `[*_~, so other positions fail on the
+# lookahead; headings and bullets are only tried at line starts
+_TOKEN = re.compile(r'''
+  (?=[`\[*_~])(?:
+    (?P<fence>```(?P<lang>[\w+\#.-]*)[^\S\n]*\n?(?P<pre>.*?)(?:```|\Z))
+  | (?P<code>`(?P<code_body>[^`\n]+)`)
+  | (?P<link>\[(?P<link_text>[^\]\n]+)\]\((?P<url>[^()\s]+)\))
+  | (?P<bold>\*\*(?P<bold_body>[^\s*](?:[^\n]*?[^\s*])?)\*\*)
+  | (?P<bold2>(?<!\w)__(?P<bold2_body>[^\s_](?:[^\n]*?[^\s_])?)__(?!\w))
+  | (?P<strike>~~(?P<strike_body>[^\s~](?:[^\n]*?[^\s~])?)~~)
+  | (?P<italic>(?<![\w*\\])\*(?P<italic_body>[^\s*](?:[^\n]*?[^\s*])?)\*(?![\w*]))
+  | (?P<italic2>(?<![\w\\])_(?P<italic2_body>[^\s_](?:[^\n]*?[^\s_])?)_(?!\w))
+  )
+| ^(?:
+    (?P<heading>[^\S\n]{0,3}\#{1,6}[^\S\n]+(?P<heading_body>[^\n]*?)[^\S\n\#]*$)
+  | (?P<bullet>(?P<indent>[^\S\n]*)[-*+][^\S\n]+)
+  )
+''', re.DOTALL | re.MULTILINE | re.VERBOSE)
+
+# Substrings without which no token can match (plain replies skip the tokenizer)
+_MARKERS = ('`', '[', '*', '_', '~', '#', '- ', '+ ')
+
+# Token -> (style, MarkdownV2 marker, body group)
+_STYLES = {
+    'bold': ('bold', '*', 'bold_body'),
+    'bold2': ('bold', '*', 'bold2_body'),
+    'italic': ('italic', '_', 'italic_body'),
+    'italic2': ('italic', '_', 'italic2_body'),
+    'strike': ('strike', '~', 'strike_body'),
+}
+
+
+def _escape(text: str, escapes) -> str:
+    # Replacing only the characters present beats str.translate (slow on
+    # non-Latin text such as Khmer) and re.sub in CPython
+    for char, escaped in escapes:
+        if char in text:
+            text = text.replace(char, escaped)
+    return text
+
+
+def escape_markdown_v2(text: str) -> str:
+    """Escape every MarkdownV2 special character (plain text)"""
+    return _escape(text, _ESCAPES_TEXT)
+
+
+def _render(text: str, inside=frozenset()) -> str:
+    """Render `text`; `inside` holds the entities enclosing it (they limit what may nest)"""
+    out = []
+    pos = 0
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind in ('heading', 'bullet') and inside:
+            continue  # only meaningful at the start of a real line
+        out.append(escape_markdown_v2(text[pos:start]))
+        pos = end
+
+        if kind == 'fence':
+            if inside:
+                out.append(escape_markdown_v2(match.group(0)))
+                continue
+            lang = match.group('lang')
+            body = _escape(match.group('pre'), _ESCAPES_CODE)
+            if body.endswith('\\'):
+                body += ' '  # "\`" would escape the closing fence
+            newline = '' if body.endswith('\n') else '\n'
+            out.append(f"```{lang}\n{body}{newline}```")
+        elif kind == 'code':
+            body = match.group('code_body')
+            # code can't be nested in other entities; keep the text
+            out.append(escape_markdown_v2(body) if inside else f"`{_escape(body, _ESCAPES_CODE)}`")
+        elif kind == 'link':
+            label = match.group('link_text')
+            if 'link' in inside:
+                out.append(escape_markdown_v2(match.group(0)))
+                continue
+            out.append(f"[{_render(label, inside | {'link'})}]({_escape(match.group('url'), _ESCAPES_URL)})")
+        elif kind == 'heading':
+            out.append(f"*{_render(match.group('heading_body'), inside | {'bold'})}*")
+        elif kind == 'bullet':
+            out.append(f"{match.group('indent')}• ")
+        else:
+            style, marker, body_group = _STYLES[kind]
+            if style in inside:
+                out.append(escape_markdown_v2(match.group(0)))
+                continue
+            out.append(f"{marker}{_render(match.group(body_group), inside | {style})}{marker}")
+    out.append(escape_markdown_v2(text[pos:]))
+    return ''.join(out)
+
+
+def to_markdown_v2(text: str) -> str:
+    """Model markdown -> Telegram MarkdownV2"""
+    if not any(marker in text for marker in _MARKERS):
+        return escape_markdown_v2(text)  # no token can start anywhere
+    return _render(text)
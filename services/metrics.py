@@ -0,0 +1,175 @@
+"""
+Metrics - per-stage latency histograms and counters for the update pipeline
+
+Stages (webhook parse, Update.de_json, handler dispatch, Groq call, MarkdownV2
+formatting, Telegram reply, ...) are timed into fixed-bucket histograms and
+exported in Prometheus text format. With METRICS_ENABLED=false every call
+returns immediately and `timer()` hands out a shared no-op context manager.
+"""
+import functools
+import time
+from bisect import bisect_left
+from config import Config
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def percentile(self, pct: float):
+        """Estimate a percentile by linear interpolation inside its bucket"""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1] * 2
+                return low + (high - low) * (target - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.metrics.inc('stage_errors', self.stage)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+class Metrics:
+    """Registry of stage histograms, labelled counters and gauges"""
+
+    def __init__(self, enabled=None):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self.histograms = {}  # {stage: Histogram}
+        self.counters = {}    # {(name, label): int}
+        self.gauges = {}      # {name: (help, callback returning {label: value})}
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def timer(self, stage: str):
+        """Context manager timing a block into `stage`"""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, stage)
+
+    def inc(self, name: str, label: str = '', value: int = 1):
+        if not self.enabled:
+            return
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def register_gauge(self, name: str, help_text: str, callback):
+        """Expose values computed at scrape time (callback -> {label: value})"""
+        self.gauges[name] = (help_text, callback)
+
+    def instrument(self, name: str):
+        """Decorator timing an async handler as stage `handler:<name>` and counting calls/errors"""
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                self.inc('handler_calls', name)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    self.inc('handler_errors', name)
+                    raise
+                finally:
+                    self.observe(f'handler:{name}', time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """{stage: {count, avg, p50, p95, p99}} for human-readable reports"""
+        result = {}
+        for stage, histogram in sorted(self.histograms.items()):
+            result[stage] = {
+                'count': histogram.count,
+                'avg': histogram.sum / histogram.count if histogram.count else None,
+                'p50': histogram.percentile(50),
+                'p95': histogram.percentile(95),
+                'p99': histogram.percentile(99),
+            }
+        return result
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = [
+            '# HELP bot_stage_seconds Time spent per update-pipeline stage',
+            '# TYPE bot_stage_seconds histogram',
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'bot_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'bot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'bot_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'bot_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f'# TYPE bot_{name}_total counter')
+            for (counter, label), value in sorted(self.counters.items()):
+                if counter == name:
+                    label_text = f'{{name="{label}"}}' if label else ''
+                    lines.append(f'bot_{name}_total{label_text} {value}')
+
+        for name, (help_text, callback) in sorted(self.gauges.items()):
+            lines.append(f'# HELP bot_{name} {help_text}')
+            lines.append(f'# TYPE bot_{name} gauge')
+            for label, value in sorted(callback().items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f'bot_{name}{{key="{label}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry
+metrics = Metrics()
@@ -0,0 +1,197 @@
+"""
+Model Router - pick a Groq model per request and fall back when one misbehaves
+
+Short, simple messages can go to the fast model (GROQ_FAST_MODEL) while code,
+long prompts and "explain why" questions stay on GROQ_MODEL. A chat can pin
+a mode with /model. Each model has a circuit breaker: rate limiting, or
+MODEL_BREAKER_STRIKES slow/failed calls in a row, sends traffic to the other
+model for MODEL_BREAKER_COOLDOWN seconds; so does a model whose Groq budget
+would make the request wait longer than MODEL_SLOW_SECONDS.
+"""
+import logging
+import re
+import time
+from config import Config
+from services.metrics import Histogram, metrics
+from services.llm_limiter import llm_limiter, LLMBusyError
+from services.storage import storage as default_storage
+
+logger = logging.getLogger(__name__)
+
+MODES = ('auto', 'fast', 'smart')
+
+# Signals that a message deserves the large model
+_COMPLEX_HINTS = re.compile(
+    r'```|\b(?:explain|why|how|compare|analy[sz]e|step[- ]by[- ]step|code|debug|prove|calculate|translate|write|summari[sz]e)\b',
+    re.IGNORECASE
+)
+
+
+class _ModelState:
+    __slots__ = ('latency', 'calls', 'failures', 'fallbacks', 'prompt_tokens', 'completion_tokens', 'strikes', 'open_until')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.calls = 0
+        self.failures = 0
+        self.fallbacks = 0  # requests moved away from this model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.strikes = 0
+        self.open_until = 0.0
+
+
+class ModelRouter:
+    """Routing table, per-chat mode and per-model circuit breakers"""
+
+    def __init__(self, storage=None, primary=None, fast=None, routing=None, fallback=None):
+        self.storage = storage
+        self.primary = primary or Config.GROQ_MODEL
+        self.fast = Config.GROQ_FAST_MODEL if fast is None else fast
+        self.routing = Config.MODEL_ROUTING if routing is None else routing
+        self.fallback = Config.MODEL_FALLBACK if fallback is None else fallback
+        self.chat_modes = {}  # {chat_id: mode}, loaded lazily from storage
+        self.models = {}      # {model: _ModelState}
+        if storage is not None:
+            storage.subscribe('chat_settings', self._forget_mode)
+
+    def _state(self, model):
+        state = self.models.get(model)
+        if state is None:
+            state = self.models[model] = _ModelState()
+        return state
+
+    # Per-chat mode
+    def get_mode(self, chat_id) -> str:
+        mode = self.chat_modes.get(chat_id)
+        if mode is None:
+            saved = self.storage.load_chat_settings(chat_id) if self.storage else None
+            mode = self.chat_modes[chat_id] = (saved or {}).get('model', 'auto')
+        return mode
+
+    def _forget_mode(self, chat_id):
+        # Changed by another worker (None: anything may have changed)
+        if chat_id is None:
+            self.chat_modes.clear()
+        else:
+            self.chat_modes.pop(chat_id, None)
+
+    def set_mode(self, chat_id, mode: str):
+        self.chat_modes[chat_id] = mode
+        if self.storage is not None:
+            self.storage.save_chat_settings(chat_id, {'model': mode})
+
+    # Routing
+    def classify(self, text: str, prompt_tokens: int) -> str:
+        """'fast' for short small talk, 'smart' for everything else"""
+        if prompt_tokens > Config.ROUTER_MAX_FAST_TOKENS:
+            return 'smart'
+        if len(text) <= Config.ROUTER_SHORT_CHARS and text.count('\n') < 2 and not _COMPLEX_HINTS.search(text):
+            return 'fast'
+        return 'smart'
+
+    def is_available(self, model, tokens: int = 0) -> bool:
+        """Circuit closed and the model's Groq budget can take `tokens` without a long wait"""
+        if time.monotonic() < self._state(model).open_until:
+            return False
+        return llm_limiter.budget(model).delay(tokens) <= Config.MODEL_SLOW_SECONDS
+
+    def choose(self, chat_id, text: str, prompt_tokens: int):
+        """(model, reason) for one request"""
+        if not self.fast:
+            return self.primary, 'single model'
+        mode = self.get_mode(chat_id)
+        if mode == 'auto':
+            tier = self.classify(text, prompt_tokens) if self.routing else 'smart'
+            reason = f'auto:{tier}'
+        else:
+            tier, reason = mode, f'chat:{mode}'
+        model = self.fast if tier == 'fast' else self.primary
+        tokens = prompt_tokens + Config.MAX_TOKENS
+        if not self.is_available(model, tokens):
+            other = self.fallback_for(model)
+            if other is not None and self.is_available(other, tokens):
+                self.record_fallback(model)
+                return other, f'{reason}, {model} unavailable'
+        return model, reason
+
+    def fallback_for(self, model):
+        """The other model, if fallback is enabled and configured"""
+        if not self.fallback or not self.fast:
+            return None
+        return self.fast if model == self.primary else self.primary
+
+    # Outcomes
+    def is_model_error(self, error) -> bool:
+        """Errors that come from Groq (Telegram errors while showing a reply do not count)"""
+        import groq
+
+        return isinstance(error, (LLMBusyError, groq.APIError))
+
+    def should_fallback(self, error) -> bool:
+        """Errors worth retrying on the other model (limits, outages, timeouts)"""
+        import groq
+
+        if isinstance(error, (LLMBusyError, groq.APIConnectionError)):
+            return True
+        return isinstance(error, groq.APIStatusError) and error.status_code >= 500
+
+    def record_success(self, model, seconds: float, prompt_tokens: int, completion_tokens: int):
+        state = self._state(model)
+        state.calls += 1
+        state.latency.observe(seconds)
+        state.prompt_tokens += prompt_tokens
+        state.completion_tokens += completion_tokens
+        metrics.observe(f'model:{model}', seconds)
+        metrics.inc('model_prompt_tokens', model, prompt_tokens)
+        metrics.inc('model_completion_tokens', model, completion_tokens)
+        if seconds > Config.MODEL_SLOW_SECONDS:
+            self._strike(model, f'slow ({seconds:.1f}s)')
+        else:
+            state.strikes = 0
+
+    def record_failure(self, model, error):
+        state = self._state(model)
+        state.calls += 1
+        state.failures += 1
+        metrics.inc('model_failures', model)
+        if isinstance(error, LLMBusyError):
+            self._open(model, 'rate limited')
+        else:
+            self._strike(model, error.__class__.__name__)
+
+    def record_fallback(self, model):
+        self._state(model).fallbacks += 1
+
+    def _strike(self, model, why: str):
+        state = self._state(model)
+        state.strikes += 1
+        if state.strikes >= Config.MODEL_BREAKER_STRIKES:
+            self._open(model, why)
+
+    def _open(self, model, why: str):
+        state = self._state(model)
+        state.strikes = 0
+        state.open_until = time.monotonic() + Config.MODEL_BREAKER_COOLDOWN
+        logger.warning(f"🔌 Circuit open for {model} ({why}), routing around it for {Config.MODEL_BREAKER_COOLDOWN}s")
+
+    def get_stats(self):
+        """{model: calls, failures, fallbacks, tokens, latency percentiles, open}"""
+        now = time.monotonic()
+        return {
+            model: {
+                'calls': state.calls,
+                'failures': state.failures,
+                'fallbacks': state.fallbacks,
+                'prompt_tokens': state.prompt_tokens,
+                'completion_tokens': state.completion_tokens,
+                'p50': state.latency.percentile(50),
+                'p95': state.latency.percentile(95),
+                'open': now < state.open_until,
+            }
+            for model, state in self.models.items()
+        }
+
+
+# Shared router used by handle_message and /model
+model_router = ModelRouter(storage=default_storage)
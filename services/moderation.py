@@ -0,0 +1,109 @@
+"""
+Moderation - single-pass banned-word matching
+
+The banned-word list is compiled once into one trie-shaped regular
+expression, so checking a message is one normalization pass plus one regex
+scan regardless of how many words are banned. The pattern is compiled in
+the startup prewarm step (off the event loop) and rebuilt when
+Config.BANNED_WORDS or Config.BANNED_WORDS_BOUNDARY is replaced
+(flask_app.reload_config does that from .env, then prewarms again).
+"""
+import logging
+import re
+import unicodedata
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Zero-width characters (Khmer text uses ZWSP as an invisible word separator) and soft hyphen
+_INVISIBLE = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u2060\ufeff\u00ad'), None)
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize, drop invisible separators and casefold"""
+    return unicodedata.normalize('NFKC', text).translate(_INVISIBLE).casefold()
+
+
+def _trie_regex(words) -> str:
+    """Build a regex alternation shaped like a trie (shared prefixes are matched once)"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        is_word = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if is_word:
+            return f'(?:{body})?'
+        return body
+
+    return build(trie)
+
+
+class ModerationEngine:
+    """Compiled banned-word matcher"""
+
+    def __init__(self, words=None, word_boundary=None):
+        self.words_source = words
+        self.boundary_source = word_boundary
+        self.word_boundary = self._current_boundary()
+        self.loaded_from = None
+        self.loaded_size = -1
+        self.pattern = None
+        self.word_count = 0
+
+    def _current_words(self):
+        return Config.BANNED_WORDS if self.words_source is None else self.words_source
+
+    def _current_boundary(self):
+        return Config.BANNED_WORDS_BOUNDARY if self.boundary_source is None else self.boundary_source
+
+    def reload(self):
+        """(Re)compile the pattern from the current word list"""
+        words = self._current_words()
+        word_boundary = self._current_boundary()
+        normalized = {normalize_text(w.strip()) for w in words if w and w.strip()}
+        pattern = None
+        if normalized:
+            body = _trie_regex(sorted(normalized))
+            if word_boundary:
+                body = rf'(?<!\w){body}(?!\w)'
+            pattern = re.compile(body)
+        # Pattern first: a find() on another thread must not see the new list with the old pattern
+        self.pattern = pattern
+        self.word_count = len(normalized)
+        self.word_boundary = word_boundary
+        self.loaded_from = words
+        self.loaded_size = len(words)
+        if pattern is not None:
+            logger.info(f"🛡 Moderation engine compiled ({self.word_count} banned words)")
+        return self
+
+    def warm(self):
+        """Compile now if the word list changed, so the first message after a start or reload does not pay for it"""
+        self._ensure_current()
+
+    def _ensure_current(self):
+        # Cheap change detection: the list object was replaced or resized, or the boundary flag changed
+        words = self._current_words()
+        if (words is not self.loaded_from or len(words) != self.loaded_size
+                or self.word_boundary != self._current_boundary()):
+            self.reload()
+
+    def find(self, message: str):
+        """First banned word in the message, or None"""
+        self._ensure_current()
+        if self.pattern is None or not message:
+            return None
+        match = self.pattern.search(normalize_text(message))
+        return match.group(0) if match else None
+
+
+# Shared engine built from Config.BANNED_WORDS
+moderation_engine = ModerationEngine()
@@ -0,0 +1,176 @@
+"""
+Reply Splitter - deliver AI replies longer than one Telegram message
+
+The model's markdown is split on paragraph boundaries, never inside a code
+block, and each chunk is formatted on its own, so every message is valid
+MarkdownV2 and no entity is cut in half. A paragraph that does not fit is
+split between lines (then words); a code block that does not fit is split
+between lines and re-opened with the same language in the next message.
+"""
+import asyncio
+import logging
+import re
+import time
+from telegram.error import BadRequest
+from services.markdown_v2 import to_markdown_v2, escape_markdown_v2
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_TEXT_LIMIT = 4096
+PARAGRAPH = "\n\n"
+
+# Same fence rule as the formatter (an unterminated fence runs to the end)
+_FENCE = re.compile(r'```(?P<lang>[\w+#.-]*)[^\S\n]*\n?(?P<pre>.*?)(?:```|\Z)', re.DOTALL)
+_BLANK_LINES = re.compile(r'\n[^\S\n]*\n\s*')
+
+
+def _blocks(text: str):
+    """Paragraphs and whole code blocks, in order"""
+    pos = 0
+    for fence in _FENCE.finditer(text):
+        yield from _paragraphs(text[pos:fence.start()])
+        yield fence.group(0)
+        pos = fence.end()
+    yield from _paragraphs(text[pos:])
+
+
+def _paragraphs(text: str):
+    for paragraph in _BLANK_LINES.split(text):
+        if paragraph.strip():
+            yield paragraph.strip('\n')
+
+
+def _formatted_len(text: str) -> int:
+    return len(to_markdown_v2(text))
+
+
+def _code_len(line: str) -> int:
+    # Inside pre only \ and ` are escaped
+    return len(line) + line.count('\\') + line.count('`')
+
+
+def _cut(text: str, size: int):
+    size = max(1, size)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _pack(parts, sep: str, limit: int, measure, split_part):
+    """Greedily join `parts` with `sep` into pieces measuring at most `limit`"""
+    pieces, current, size = [], [], 0
+    for part in parts:
+        width = measure(part)
+        if current and size + len(sep) + width <= limit:
+            current.append(part)
+            size += len(sep) + width
+            continue
+        if current:
+            pieces.append(sep.join(current))
+        if width > limit:
+            pieces.extend(split_part(part))
+            current, size = [], 0
+        else:
+            current, size = [part], width
+    if current:
+        pieces.append(sep.join(current))
+    return pieces
+
+
+def _fit(block: str, limit: int):
+    """Split one block into source pieces that each format to at most `limit` characters"""
+    if _formatted_len(block) <= limit:
+        return [block]
+    return _split(block, limit)
+
+
+def _split(block: str, limit: int):
+    fence = _FENCE.fullmatch(block)
+    if fence:
+        lang = fence.group('lang')
+        room = limit - len(lang) - 8  # ```lang\n ... \n``` around every piece
+        lines = fence.group('pre').rstrip('\n').split('\n')
+        pieces = _pack(lines, '\n', room, _code_len, lambda line: _cut(line, room // 2))
+        return [f"```{lang}\n{piece}\n```" for piece in pieces]
+
+    if '\n' in block:
+        # Inline entities never span lines, so line lengths add up exactly
+        return _pack(block.split('\n'), '\n', limit, _formatted_len, lambda line: _fit(line, limit))
+
+    if ' ' in block.strip():
+        # Escaped length is an upper bound for words; check the joined pieces anyway
+        pieces = _pack(block.split(' '), ' ', limit, lambda word: len(escape_markdown_v2(word)),
+                       lambda word: _cut(word, limit // 2))
+        return [cut for piece in pieces for cut in ([piece] if _formatted_len(piece) <= limit else _cut(piece, limit // 2))]
+
+    return _cut(block, limit // 2)  # escaping at most doubles the length
+
+
+def iter_chunks(text: str, limit: int = TELEGRAM_TEXT_LIMIT):
+    """Yield (markdown_v2, plain) chunks of a model reply, each fitting one message"""
+    current, formatted = None, None
+    for block in _blocks(text):
+        block_formatted = to_markdown_v2(block)
+        fits = len(block_formatted) <= limit
+        for piece in [block] if fits else _split(block, limit):
+            piece_formatted = block_formatted if fits else to_markdown_v2(piece)
+            if current is not None and len(formatted) + len(PARAGRAPH) + len(piece_formatted) <= limit:
+                current += PARAGRAPH + piece
+                formatted += PARAGRAPH + piece_formatted
+                continue
+            if current is not None:
+                yield formatted, current
+            current, formatted = piece, piece_formatted
+    if current is not None:
+        yield formatted, current
+
+
+def split_reply(text: str, limit: int = TELEGRAM_TEXT_LIMIT):
+    """All chunks of a model reply as a list of (markdown_v2, plain)"""
+    return list(iter_chunks(text, limit))
+
+
+async def send_chunk(message, formatted: str, plain: str, reply: bool = True):
+    """Send one chunk as MarkdownV2, or as plain text if rejected (the send limiter waits out flood limits)"""
+    send = message.reply_text if reply else message.chat.send_message
+    try:
+        return await send(formatted, parse_mode='MarkdownV2')
+    except BadRequest as e:
+        logger.error(f"Markdown error: {e}, falling back to plain text")
+        metrics.inc('markdown_fallback')
+    return await send(plain)
+
+
+async def send_reply(message, text: str, chunks=None, quote: bool = True):
+    """Reply with `text`, split into as many messages as needed, in order.
+
+    Sends are sequential because Telegram does not order concurrent requests,
+    but each send is started before the next chunk is split and formatted, so
+    that work overlaps the previous round trip; the time spent splitting and
+    formatting is recorded as the `format` stage. With `quote` the first chunk
+    replies to `message`. Returns the number of messages sent.
+    """
+    pending = None
+    count = 0
+    timed = chunks is None
+    chunks = iter(chunks if chunks is not None else iter_chunks(text))
+    formatting = 0.0
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        formatting += time.perf_counter() - started
+        if chunk is None:
+            break
+        formatted, plain = chunk
+        if pending is not None:
+            await pending
+        pending = asyncio.create_task(send_chunk(message, formatted, plain, reply=quote and count == 0))
+        count += 1
+        await asyncio.sleep(0)  # let the request go out before preparing the next chunk
+    if pending is not None:
+        await pending
+    if timed:
+        metrics.observe('format', formatting)  # splitting + MarkdownV2 conversion, without the sends
+    if count > 1:
+        metrics.inc('reply_chunks', value=count)
+        logger.info(f"✂️ Reply to chat {message.chat_id} sent as {count} messages")
+    return count
@@ -0,0 +1,104 @@
+"""
+Reporting - incremental activity counters for the periodic report
+
+Events land in rotating time buckets (a ring covering one report window),
+so recording is O(1) and building a report only merges the ring; nothing
+rescans per-user state.
+"""
+import time
+from bisect import bisect_left
+from config import Config
+
+# AI latency histogram bucket upper bounds in seconds (~25% steps from 50 ms to ~2 min)
+LATENCY_BOUNDS = [0.05 * 1.25 ** i for i in range(36)]
+
+
+class _Bucket:
+    __slots__ = ('epoch', 'messages', 'users', 'errors', 'latencies', 'ai_calls', 'latency_sum')
+
+    def __init__(self):
+        self.reset(-1)
+
+    def reset(self, epoch):
+        self.epoch = epoch
+        self.messages = 0
+        self.users = set()
+        self.errors = 0
+        self.latencies = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.ai_calls = 0
+        self.latency_sum = 0.0
+
+
+class ActivityAggregator:
+    """Sliding-window counters: messages, active users, AI latency percentiles, errors"""
+
+    def __init__(self, window=None, bucket_seconds=10):
+        self.window = window or Config.REPORT_INTERVAL or 120
+        self.bucket_seconds = bucket_seconds
+        self.ring = [_Bucket() for _ in range(max(1, int(self.window // bucket_seconds)))]
+
+    def _bucket(self):
+        epoch = int(time.monotonic() // self.bucket_seconds)
+        bucket = self.ring[epoch % len(self.ring)]
+        if bucket.epoch != epoch:
+            bucket.reset(epoch)
+        return bucket
+
+    def record_message(self, user_id):
+        bucket = self._bucket()
+        bucket.messages += 1
+        bucket.users.add(user_id)
+
+    def record_ai_latency(self, seconds: float):
+        bucket = self._bucket()
+        bucket.ai_calls += 1
+        bucket.latency_sum += seconds
+        bucket.latencies[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+
+    def record_error(self):
+        self._bucket().errors += 1
+
+    def snapshot(self):
+        """Merge the buckets of the current window"""
+        current = int(time.monotonic() // self.bucket_seconds)
+        oldest = current - len(self.ring) + 1
+        messages = errors = ai_calls = 0
+        latency_sum = 0.0
+        users = set()
+        latencies = [0] * (len(LATENCY_BOUNDS) + 1)
+        for bucket in self.ring:
+            if bucket.epoch < oldest:
+                continue
+            messages += bucket.messages
+            errors += bucket.errors
+            ai_calls += bucket.ai_calls
+            latency_sum += bucket.latency_sum
+            users |= bucket.users
+            for i, count in enumerate(bucket.latencies):
+                latencies[i] += count
+
+        def percentile(pct):
+            if not ai_calls:
+                return None
+            target = ai_calls * pct / 100
+            seen = 0
+            for i, count in enumerate(latencies):
+                seen += count
+                if seen >= target:
+                    return LATENCY_BOUNDS[min(i, len(LATENCY_BOUNDS) - 1)]
+
+        return {
+            'window': len(self.ring) * self.bucket_seconds,
+            'messages': messages,
+            'active_users': len(users),
+            'errors': errors,
+            'ai_calls': ai_calls,
+            'latency_avg': latency_sum / ai_calls if ai_calls else None,
+            'latency_p50': percentile(50),
+            'latency_p95': percentile(95),
+            'latency_p99': percentile(99),
+        }
+
+
+# Shared aggregator fed by the handlers
+activity = ActivityAggregator()
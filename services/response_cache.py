@@ -0,0 +1,90 @@
+"""
+Response Cache - LRU + TTL cache of LLM completions for repeated prompts
+"""
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from config import Config
+
+_whitespace = re.compile(r'\s+')
+
+
+def _normalize(text: str) -> str:
+    return _whitespace.sub(' ', text or '').strip().casefold()
+
+
+class ResponseCache:
+    """Completions keyed on (model, temperature, system prompt, trailing context).
+
+    Only the last `context_messages` non-system messages take part in the key,
+    so FAQ-style prompts hit regardless of older history. The default of 3
+    keeps the previous exchange in the key: a context-dependent follow-up
+    ("why?", "translate it") is only reused after the same earlier answer. Requests with a
+    temperature above `max_temperature` bypass the cache (their answers are
+    meant to vary).
+    """
+
+    def __init__(self, enabled=None, max_entries=None, ttl=None, context_messages=None, max_temperature=None):
+        self.enabled = Config.RESPONSE_CACHE if enabled is None else enabled
+        self.max_entries = Config.RESPONSE_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = Config.RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.context_messages = context_messages or Config.RESPONSE_CACHE_CONTEXT
+        self.max_temperature = Config.RESPONSE_CACHE_MAX_TEMPERATURE if max_temperature is None else max_temperature
+        self.entries = OrderedDict()  # {key: (expires_at, response)}
+        self.stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evicted': 0, 'expired': 0}
+
+    def key_for(self, model: str, temperature: float, messages: list):
+        """Cache key for a request, or None when the request must not be cached"""
+        if not self.enabled:
+            return None
+        if temperature > self.max_temperature:
+            self.stats['bypassed'] += 1
+            return None
+        system = [m['content'] for m in messages if m['role'] == 'system'][:1]
+        window = [m for m in messages if m['role'] != 'system'][-self.context_messages:]
+        payload = json.dumps(
+            [model, round(temperature, 3), system, [(m['role'], _normalize(m['content'])) for m in window]],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Cached response or None"""
+        if key is None:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return response
+
+    def put(self, key, response: str):
+        if key is None or not response:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    def get_stats(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(
+            self.stats,
+            entries=len(self.entries),
+            hit_rate=self.stats['hits'] / lookups if lookups else 0.0
+        )
+
+
+# Shared cache used by the message handler
+response_cache = ResponseCache()
@@ -0,0 +1,78 @@
+"""
+Startup - cold start phase timing and background prewarming
+
+Import this module first in an entry point: its import time is the zero of
+every phase. Phases are logged once the bot is ready and exported as the
+`startup` gauge on /metrics.
+"""
+import time
+
+PROCESS_START = time.perf_counter()  # before any other import of this module
+
+import asyncio  # noqa: E402
+import importlib  # noqa: E402
+import logging  # noqa: E402
+from contextlib import contextmanager  # noqa: E402
+from config import Config  # noqa: E402
+from services.metrics import metrics  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Seconds spent in each startup phase, plus when the app could serve and when the bot was ready"""
+
+    def __init__(self, started: float = PROCESS_START):
+        self.started = started
+        self.phases = {}  # {phase: seconds}, in the order they ran
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def mark(self, name: str):
+        """Record a milestone as seconds since process start"""
+        self.phases[name] = time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+    def get_stats(self):
+        return dict(self.phases)
+
+
+# Shared timer of this process
+startup = StartupTimer()
+metrics.register_gauge('startup', 'Seconds spent in each cold start phase', startup.get_stats)
+
+
+async def import_modules(*names):
+    """Import modules in a worker thread so the event loop keeps serving meanwhile"""
+    await asyncio.to_thread(lambda: [importlib.import_module(name) for name in names])
+
+
+async def prewarm():
+    """Compile the banned-word pattern, import groq and open the Groq connection so the first reply does not pay for it"""
+    from services.moderation import moderation_engine
+
+    with startup.phase('prewarm_moderation'):
+        await asyncio.to_thread(moderation_engine.warm)  # ~0.3s for 10k words
+    if not Config.PREWARM:
+        return
+    try:
+        with startup.phase('prewarm_groq_import'):
+            await import_modules('groq')  # ~0.3s
+        from handlers.messages import get_groq_client
+
+        client = get_groq_client()
+        if client is not None:
+            with startup.phase('prewarm_groq_connect'):
+                await client.models.list()
+    except Exception as e:
+        logger.info(f"🔥 Groq prewarm skipped: {e}")
+    startup.mark('prewarmed')
+    logger.info(f"🔥 Startup phases: {startup.summary()}")
@@ -0,0 +1,405 @@
+"""
+Storage - persistence for conversations, chat settings, user activity and counters
+
+SQLite (WAL) is the default backend; MemoryStorage keeps everything in dicts
+for tests and throwaway runs. Writes are write-behind: callers only record
+the latest value per key, and a background thread commits all dirty keys in
+one transaction every STORAGE_FLUSH_INTERVAL seconds, so the message hot path
+never waits on disk. Reads check the pending writes first, then the database.
+
+With STORAGE_SHARED several worker processes use one database file: writes
+are committed immediately and logged, and each process drops the cache
+entries other processes changed (see SharedSQLiteStorage).
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Tables and their key column (every table is key -> JSON value)
+TABLES = {
+    'conversations': 'chat_id',
+    'ai_chats': 'chat_id',
+    'chat_settings': 'chat_id',
+    'users': 'user_id',
+    'counters': 'name',
+}
+
+# Change log rows kept for processes that have not synced yet
+CHANGE_LOG_KEEP = 10000
+
+
+def _decode_key(key: str):
+    """Keys are stored as text; chat and user ids come back as ints"""
+    try:
+        return int(key)
+    except ValueError:
+        return key
+
+
+class MemoryStorage:
+    """Dict-backed storage (nothing survives a restart)"""
+
+    shared = False  # True when other processes write to the same data
+
+    def __init__(self):
+        self.tables = {table: {} for table in TABLES}
+        self.listeners = {}  # {table: [callback(key or None)]}
+        self.stats = {'reads': 0, 'writes': 0, 'flushes': 0}
+
+    def get(self, table, key):
+        self.stats['reads'] += 1
+        return self.tables[table].get(key)
+
+    def put(self, table, key, value):
+        self.stats['writes'] += 1
+        self.tables[table][key] = value
+
+    def count(self, table):
+        return len(self.tables[table])
+
+    def update(self, table, key, fn):
+        """Store fn(current value) and return it (atomic across processes when shared)"""
+        value = fn(self.get(table, key))
+        self.put(table, key, value)
+        return value
+
+    def subscribe(self, table, callback):
+        """Call `callback(key)` when another process changes `key` (None = anything may have changed)"""
+        self.listeners.setdefault(table, []).append(callback)
+
+    def sync(self) -> int:
+        """Apply changes made by other processes to the subscribers' caches"""
+        return 0
+
+    def _notify(self, changes):
+        for table, key in changes:
+            for callback in self.listeners.get(table, ()):
+                callback(key)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    # Typed helpers shared by both backends
+    def load_history(self, chat_id):
+        return self.get('conversations', chat_id)
+
+    def save_history(self, chat_id, messages):
+        self.put('conversations', chat_id, list(messages))
+
+    def load_ai_enabled(self, chat_id):
+        return self.get('ai_chats', chat_id)
+
+    def save_ai_enabled(self, chat_id, enabled: bool):
+        self.put('ai_chats', chat_id, enabled)
+
+    def load_chat_settings(self, chat_id):
+        return self.get('chat_settings', chat_id)
+
+    def save_chat_settings(self, chat_id, settings: dict):
+        self.put('chat_settings', chat_id, settings)
+
+    def load_user(self, user_id):
+        return self.get('users', user_id)
+
+    def save_user(self, user_id, record: dict):
+        self.put('users', user_id, record)
+
+    def count_users(self):
+        return self.count('users')
+
+    def load_counter(self, name, default=0):
+        value = self.get('counters', name)
+        return default if value is None else value
+
+    def save_counter(self, name, value):
+        self.put('counters', name, value)
+
+    def increment_counter(self, name, delta=1):
+        return self.update('counters', name, lambda value: (value or 0) + delta)
+
+
+class SQLiteStorage(MemoryStorage):
+    """SQLite (WAL mode) storage with write-behind batching"""
+
+    write_behind = True  # False = writes are committed by put() itself, no flush thread
+
+    def __init__(self, path, flush_interval=1.0, batch_size=500):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.pending = {}  # {(table, key): value} - latest value wins
+        self.inflight = {}  # batch being committed, still readable until COMMIT
+        self.user_count = None
+        self.wakeup = threading.Event()
+        self.closed = False
+
+        self.conn = self._connect()
+        for table, key in TABLES.items():
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({key} TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+        # data_version only moves when another connection commits
+        self.seen_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        self.foreign_writer = False
+
+        self.thread = None
+        if self.write_behind:
+            self.thread = threading.Thread(target=self._flush_loop, name='storage-flush', daemon=True)
+            self.thread.start()
+        atexit.register(self.close)
+        os.register_at_fork(after_in_child=self._after_fork)
+        if self.write_behind:
+            logger.info(f"💾 SQLite storage ready at {path} (flush every {flush_interval}s)")
+        else:
+            logger.info(f"💾 SQLite storage ready at {path} (writes committed immediately)")
+
+    def _after_fork(self):
+        # Pre-forking servers import the app once: each worker needs its own connection and flush thread
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.inflight = {}
+        self.parent_conn = self.conn  # never used or closed in the child
+        self.conn = self._connect()
+        self.seen_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if self.write_behind and not self.closed:
+            self.thread = threading.Thread(target=self._flush_loop, name='storage-flush', daemon=True)
+            self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def get(self, table, key):
+        with self.lock:
+            if (table, key) in self.pending:
+                return self.pending[(table, key)]
+            if (table, key) in self.inflight:
+                return self.inflight[(table, key)]
+        self.stats['reads'] += 1
+        with self.db_lock:
+            row = self.conn.execute(
+                f'SELECT value FROM {table} WHERE {TABLES[table]} = ?', (str(key),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, table, key, value):
+        with self.lock:
+            self.pending[(table, key)] = value
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def count(self, table):
+        if table == 'users' and self.user_count is not None:
+            return self.user_count  # refreshed after every flush
+        with self.db_lock:
+            value = self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        if table == 'users':
+            self.user_count = value
+        return value
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self._check_foreign_writer()
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Storage flush failed: {e}")
+
+    def _check_foreign_writer(self):
+        """Warn once when another process commits to our file (its caches and ours overwrite each other)"""
+        if self.foreign_writer:
+            return
+        with self.db_lock:
+            version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self.seen_version:
+            self.foreign_writer = True
+            logger.warning(
+                f"⚠️ Another process is writing to {self.path}: write-behind storage is single-process, "
+                f"so the workers overwrite each other's data. Set STORAGE_SHARED=true for multiple workers."
+            )
+
+    def flush(self):
+        """Commit all pending writes in one transaction"""
+        with self.db_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, {}
+                self.inflight = batch
+
+            rows = {}
+            for (table, key), value in batch.items():
+                rows.setdefault(table, []).append((str(key), json.dumps(value, ensure_ascii=False, default=str)))
+
+            self.conn.execute('BEGIN')
+            try:
+                for table, values in rows.items():
+                    self.conn.executemany(
+                        f'INSERT INTO {table} ({TABLES[table]}, value) VALUES (?, ?) '
+                        f'ON CONFLICT({TABLES[table]}) DO UPDATE SET value = excluded.value',
+                        values
+                    )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                with self.lock:
+                    # Put the batch back unless newer values arrived meanwhile
+                    for item, value in batch.items():
+                        self.pending.setdefault(item, value)
+                    self.inflight = {}
+                raise
+            with self.lock:
+                self.inflight = {}
+            if 'users' in rows:
+                self.user_count = self.conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+        self.stats['writes'] += len(batch)
+        self.stats['flushes'] += 1
+
+    def close(self):
+        """Flush outstanding writes and close the database"""
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        try:
+            self.flush()
+        finally:
+            with self.db_lock:
+                self.conn.close()
+
+
+class SharedSQLiteStorage(SQLiteStorage):
+    """SQLite shared by several worker processes (STORAGE_SHARED).
+
+    Every write is committed at once together with a row in the `changes`
+    log. `sync()` is cheap when nothing happened (PRAGMA data_version only
+    moves when another connection commits); otherwise it reads the log
+    written by other processes since the last call and tells the subscribers
+    which keys to drop from their in-process caches. `update()` runs under
+    BEGIN IMMEDIATE, so concurrent workers never lose each other's appends
+    or increments. Writes are synchronous (tens of microseconds uncontended,
+    up to busy_timeout while another worker holds the write lock).
+    """
+
+    shared = True
+    write_behind = False
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.stats.update(synced=0, invalidated=0)
+        with self.db_lock:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS changes '
+                '(seq INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, key TEXT NOT NULL, origin TEXT NOT NULL)'
+            )
+            self.last_seq = self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+            self.data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        logger.info(f"🔗 Shared storage mode: worker {self.origin} starts at change {self.last_seq}")
+
+    def _after_fork(self):
+        super()._after_fork()
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _write(self, table, key, value):
+        # Inside a transaction, with db_lock held
+        self.conn.execute(
+            f'INSERT INTO {table} ({TABLES[table]}, value) VALUES (?, ?) '
+            f'ON CONFLICT({TABLES[table]}) DO UPDATE SET value = excluded.value',
+            (str(key), json.dumps(value, ensure_ascii=False, default=str))
+        )
+        seq = self.conn.execute(
+            'INSERT INTO changes (tbl, key, origin) VALUES (?, ?, ?)', (table, str(key), self.origin)
+        ).lastrowid
+        if seq % 1000 == 0:
+            self.conn.execute('DELETE FROM changes WHERE seq <= ?', (seq - CHANGE_LOG_KEEP,))
+
+    def _transaction(self, table, key, fn):
+        with self.db_lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                value = fn()
+                self._write(table, key, value)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        self.stats['writes'] += 1
+        return value
+
+    def put(self, table, key, value):
+        self._transaction(table, key, lambda: value)
+
+    def update(self, table, key, fn):
+        def read_modify():
+            row = self.conn.execute(
+                f'SELECT value FROM {table} WHERE {TABLES[table]} = ?', (str(key),)
+            ).fetchone()
+            return fn(json.loads(row[0]) if row else None)
+
+        return self._transaction(table, key, read_modify)
+
+    def count(self, table):
+        with self.db_lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def sync(self) -> int:
+        with self.db_lock:
+            version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self.data_version:
+                return 0
+            self.data_version = version
+            oldest = self.conn.execute('SELECT MIN(seq) FROM changes').fetchone()[0]
+            rows = self.conn.execute(
+                'SELECT seq, tbl, key, origin FROM changes WHERE seq > ? ORDER BY seq', (self.last_seq,)
+            ).fetchall()
+        self.stats['synced'] += 1
+        if oldest is not None and oldest > self.last_seq + 1:
+            # Fell behind the pruned log: every cache may be stale
+            logger.warning(f"⚠️ Worker {self.origin} missed changes {self.last_seq + 1}-{oldest - 1}, dropping all caches")
+            changes = [(table, None) for table in self.listeners]
+        else:
+            changes = {(table, _decode_key(key)) for _, table, key, origin in rows if origin != self.origin}
+        if rows:
+            self.last_seq = rows[-1][0]
+        self.stats['invalidated'] += len(changes)
+        self._notify(changes)
+        return len(changes)
+
+
+def create_storage():
+    """Build the storage backend selected by Config.STORAGE_BACKEND"""
+    if Config.STORAGE_BACKEND == 'memory':
+        return MemoryStorage()
+    try:
+        if Config.STORAGE_SHARED:
+            return SharedSQLiteStorage(Config.STORAGE_PATH)
+        return SQLiteStorage(Config.STORAGE_PATH, Config.STORAGE_FLUSH_INTERVAL, Config.STORAGE_BATCH_SIZE)
+    except sqlite3.Error as e:
+        logger.error(f"❌ Cannot open {Config.STORAGE_PATH} ({e}), falling back to in-memory storage")
+        return MemoryStorage()
+
+
+# Shared storage used by BotService, LoggerService and the conversation store
+storage = create_storage()
@@ -0,0 +1,140 @@
+"""
+Stream Editor - shows a streaming AI reply by editing one Telegram message
+"""
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest, RetryAfter
+from config import Config
+from services.metrics import metrics
+from services.reply_splitter import TELEGRAM_TEXT_LIMIT, split_reply, send_reply
+
+logger = logging.getLogger(__name__)
+
+CURSOR = " ▌"
+
+
+class StreamingReply:
+    """Coalesce streamed text into as few Telegram edits as possible.
+
+    The first visible text is sent as a reply; after that an edit is issued
+    only when at least `min_interval` seconds have passed since the last one
+    AND at least `min_delta` new characters arrived. Edits run in the
+    background so the completion stream is never held up by Telegram, and at
+    most one edit is in flight. A `RetryAfter` on an interim edit pushes the
+    next edit back; the final edit is retried by the shared send limiter.
+    """
+
+    def __init__(self, message, min_interval: float = None, min_delta: int = None):
+        is_group = message.chat.type != 'private'
+        self.message = message
+        self.min_interval = min_interval or (
+            Config.STREAM_GROUP_EDIT_INTERVAL if is_group else Config.STREAM_EDIT_INTERVAL
+        )
+        self.min_delta = min_delta or Config.STREAM_MIN_DELTA
+        self.parts = []
+        self.length = 0
+        self.reply = None
+        self.shown_length = 0
+        self.next_edit_at = 0.0
+        self.edit_task = None
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.edits = 0
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+    @property
+    def ttft(self):
+        """Seconds from start to the first visible token (None if nothing shown yet)"""
+        return self.first_token_at - self.started if self.first_token_at else None
+
+    async def feed(self, delta: str):
+        """Add streamed text; sends or schedules an edit when due"""
+        if not delta:
+            return
+        self.parts.append(delta)
+        self.length += len(delta)
+
+        if self.reply is None:
+            if not self.text.strip():
+                return
+            await self._send_first()
+            return
+
+        if self.edit_task is not None and not self.edit_task.done():
+            return
+        now = time.monotonic()
+        if now < self.next_edit_at or self.length - self.shown_length < self.min_delta:
+            return
+        self.edit_task = asyncio.create_task(self._edit(self.text + CURSOR))
+
+    async def _send_first(self):
+        text = self.text
+        self.reply = await self.message.reply_text(text[:TELEGRAM_TEXT_LIMIT] + CURSOR)
+        self.first_token_at = time.perf_counter()
+        self.shown_length = len(text)
+        self.next_edit_at = time.monotonic() + self.min_interval
+        logger.info(f"⚡ First token visible in chat {self.message.chat_id} after {self.ttft:.2f}s")
+
+    async def _edit(self, text: str, parse_mode: str = None, final: bool = False):
+        length = self.length
+        try:
+            # Interim edits are not retried by the send limiter: a later edit catches up
+            await self.reply.get_bot().edit_message_text(
+                text[:TELEGRAM_TEXT_LIMIT], chat_id=self.reply.chat_id, message_id=self.reply.message_id,
+                parse_mode=parse_mode, rate_limit_args=None if final else 0
+            )
+            self.edits += 1
+            self.shown_length = length
+            self.next_edit_at = time.monotonic() + self.min_interval
+        except RetryAfter as e:
+            self.next_edit_at = time.monotonic() + e.retry_after
+            if final:
+                raise
+            logger.warning(f"⏳ Edit rate limited in chat {self.message.chat_id}, retry after {e.retry_after}s")
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                return
+            if parse_mode:
+                raise
+            logger.error(f"Stream edit error: {e}")
+
+    async def finish(self):
+        """Show the complete reply, MarkdownV2-formatted when possible, plain text otherwise.
+
+        A reply over Telegram's limit keeps its first chunk in the streamed
+        message and continues in new messages.
+        """
+        if self.edit_task is not None:
+            await asyncio.gather(self.edit_task, return_exceptions=True)
+        text = self.text
+        if self.reply is None:
+            # Nothing was streamed (empty or whitespace-only response)
+            if not text.strip():
+                return
+            await self._send_first()
+
+        delay = self.next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        with metrics.timer('format'):
+            chunks = split_reply(text)
+        formatted, plain = chunks[0]
+        sent = False
+        try:
+            await self._edit(formatted, parse_mode='MarkdownV2', final=True)
+            sent = True
+        except BadRequest as e:
+            logger.error(f"Markdown error: {e}, falling back to plain text")
+        if not sent:
+            await self._edit(plain, final=True)
+        if len(chunks) > 1:
+            await send_reply(self.message, text, chunks=chunks[1:], quote=False)
+        logger.info(
+            f"✅ Streamed reply to chat {self.message.chat_id} with {self.edits} edits "
+            f"(first token after {self.ttft:.2f}s, total {time.perf_counter() - self.started:.2f}s)"
+        )
@@ -0,0 +1,176 @@
+"""
+Telegram Client - the one configured outbound Bot API client
+
+Every entry point (bot.py, flask_app.py, asgi_app.py, webhook_manager.py)
+builds its Application or Bot here, so handlers, LoggerService and the
+management routes share one tuned HTTPX connection pool and one send limiter.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+from telegram import Bot
+from telegram.error import RetryAfter
+from telegram.ext import Application, BaseRateLimiter
+from telegram.request import HTTPXRequest
+from config import Config
+from services.metrics import metrics
+from services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods that post or change a message in a chat (count against flood limits)
+_MESSAGE_PREFIXES = ('send', 'edit', 'copyMessage', 'forwardMessage')
+_UNLIMITED = {'sendChatAction'}
+
+# Idle chat lanes are dropped once there are more than this many
+_MAX_LANES = 1024
+
+
+def _http_version() -> str:
+    if not Config.TELEGRAM_HTTP2:
+        return '1.1'
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("⚠️ TELEGRAM_HTTP2=true but the h2 package is missing (pip install httpx[http2]), using HTTP/1.1")
+        return '1.1'
+    return '2'
+
+
+def build_request(pool_size: int = None) -> HTTPXRequest:
+    """HTTPXRequest with the configured pool, timeouts and HTTP version"""
+    return HTTPXRequest(
+        connection_pool_size=pool_size or Config.TELEGRAM_POOL_SIZE,
+        connect_timeout=Config.TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=Config.TELEGRAM_READ_TIMEOUT,
+        write_timeout=Config.TELEGRAM_WRITE_TIMEOUT,
+        pool_timeout=Config.TELEGRAM_POOL_TIMEOUT,
+        http_version=_http_version(),
+    )
+
+
+class _ChatLane:
+    __slots__ = ('lock', 'bucket')
+
+    def __init__(self, group: bool):
+        self.lock = asyncio.Lock()  # FIFO: a chat's messages leave in the order they were sent
+        if group:
+            self.bucket = TokenBucket(Config.SEND_GROUP_PER_MINUTE / 60, capacity=Config.SEND_CHAT_BURST)
+        else:
+            self.bucket = TokenBucket(Config.SEND_CHAT_PER_SECOND, capacity=Config.SEND_CHAT_BURST)
+
+
+class SendLimiter(BaseRateLimiter):
+    """Global + per-chat flood control for every Bot API call of the shared bot.
+
+    Message sends and edits queue per chat (in order) for the chat's bucket,
+    then for the global bucket (SEND_GLOBAL_PER_SECOND). A `RetryAfter`
+    answer pauses only the bucket it belongs to (the chat's, or the global
+    one for chat-less calls) and the call is retried up to SEND_MAX_RETRIES
+    times, so bursts are delayed instead of lost. Pass `rate_limit_args=N`
+    to a Bot method to override the retry count for that call.
+    """
+
+    def __init__(self, global_rate=None, max_retries=None):
+        global_rate = global_rate or Config.SEND_GLOBAL_PER_SECOND
+        self.bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.max_retries = Config.SEND_MAX_RETRIES if max_retries is None else max_retries
+        self.lanes = {}  # {chat_id: _ChatLane}
+        self.stats = {'requests': 0, 'limited': 0, 'delayed': 0, 'retry_after': 0, 'gave_up': 0}
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Chat locks are bound to the parent's event loop
+        self.lanes = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _lane(self, chat_id) -> _ChatLane:
+        lane = self.lanes.get(chat_id)
+        if lane is None:
+            if len(self.lanes) >= _MAX_LANES:
+                self._prune()
+            group = isinstance(chat_id, str) or chat_id < 0
+            lane = self.lanes[chat_id] = _ChatLane(group)
+        return lane
+
+    def _prune(self):
+        # A lane can go once nobody waits on it and its bucket has refilled
+        for chat_id, lane in list(self.lanes.items()):
+            if not lane.lock.locked() and lane.bucket.delay() == 0 and lane.bucket.tokens >= lane.bucket.capacity:
+                del self.lanes[chat_id]
+
+    async def _acquire(self, bucket: TokenBucket):
+        if bucket.delay() > 0:
+            self.stats['delayed'] += 1
+        await bucket.acquire()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        self.stats['requests'] += 1
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        chat_id = data.get('chat_id')
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        limited = chat_id is not None and endpoint.startswith(_MESSAGE_PREFIXES) and endpoint not in _UNLIMITED
+        if not limited:
+            # Chat-less calls (setWebhook, getMe...) share the global pause; chat actions just wait
+            bucket = self.bucket if chat_id is None else None
+            return await self._call(callback, args, kwargs, endpoint, max_retries, bucket, limited)
+
+        self.stats['limited'] += 1
+        lane = self._lane(chat_id)
+        started = asyncio.get_running_loop().time()
+        async with lane.lock:
+            await self._acquire(lane.bucket)
+            await self._acquire(self.bucket)
+            metrics.observe('telegram_send_wait', asyncio.get_running_loop().time() - started)
+            return await self._call(callback, args, kwargs, endpoint, max_retries, lane.bucket, limited)
+
+    async def _call(self, callback, args, kwargs, endpoint, max_retries, bucket, limited):
+        for attempt in range(max_retries + 1):
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.stats['retry_after'] += 1
+                metrics.inc('telegram_retry_after', endpoint)
+                if attempt == max_retries:
+                    self.stats['gave_up'] += 1
+                    raise
+                logger.warning(f"⏳ {endpoint} flood limited, retry {attempt + 1} in {e.retry_after}s")
+                if bucket is None:
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                bucket.block(e.retry_after)
+                await self._acquire(bucket)
+                if limited:
+                    await self._acquire(self.bucket)
+
+    def get_stats(self):
+        return dict(self.stats, chats=len(self.lanes))
+
+
+# Shared by the Application of this process
+send_limiter = SendLimiter()
+metrics.register_gauge('telegram_send', 'Outbound Bot API flood control', send_limiter.get_stats)
+
+
+def application_builder():
+    """Application.builder() preset with token, API URL, the shared pool and the send limiter"""
+    return (
+        Application.builder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        .base_url(Config.TELEGRAM_API_BASE_URL)
+        .request(build_request())
+        .get_updates_request(build_request(pool_size=1))  # long polling uses one connection
+        .rate_limiter(send_limiter)
+    )
+
+
+def build_bot() -> Bot:
+    """Standalone Bot (scripts) with the same connection settings"""
+    return Bot(token=Config.TELEGRAM_BOT_TOKEN, base_url=Config.TELEGRAM_API_BASE_URL, request=build_request())
@@ -0,0 +1,52 @@
+"""
+Update Dedup - drop webhook redeliveries before they are parsed
+
+Telegram resends an update when the webhook answers slowly or with an error.
+The last UPDATE_DEDUP_WINDOW update_ids are remembered in a ring buffer plus
+a set (about 100 bytes per id), so a redelivery is answered 200 without
+de_json, a second Groq completion or a second reply.
+"""
+import threading
+from collections import deque
+from config import Config
+from services.metrics import metrics
+
+
+class UpdateDeduplicator:
+    """Bounded window of recently accepted update_ids"""
+
+    def __init__(self, window=None):
+        self.window = Config.UPDATE_DEDUP_WINDOW if window is None else window
+        self.order = deque()  # accepted ids, oldest first
+        self.seen = set()
+        self.lock = threading.Lock()  # Flask may serve requests from several threads
+        self.stats = {'accepted': 0, 'duplicates': 0}
+
+    def accept(self, update_id) -> bool:
+        """True the first time an update_id is seen, False for a redelivery"""
+        if not self.window or update_id is None:
+            return True
+        with self.lock:
+            if update_id in self.seen:
+                self.stats['duplicates'] += 1
+                metrics.inc('webhook_duplicates')
+                return False
+            self.seen.add(update_id)
+            self.order.append(update_id)
+            if len(self.order) > self.window:
+                self.seen.discard(self.order.popleft())
+            self.stats['accepted'] += 1
+        return True
+
+    def forget(self, update_id):
+        """Let Telegram's retry through (the update was refused, e.g. queue full)"""
+        with self.lock:
+            self.seen.discard(update_id)  # its ring slot just ages out
+
+    def get_stats(self):
+        return dict(self.stats, window=len(self.seen))
+
+
+# Shared by the webhook routes of this process
+update_dedup = UpdateDeduplicator()
+metrics.register_gauge('update_dedup', 'Webhook update_id deduplication', update_dedup.get_stats)
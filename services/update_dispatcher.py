@@ -0,0 +1,153 @@
+"""
+Update Dispatcher - runs webhook updates on a long-lived background event loop
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from config import Config
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDispatcher:
+    """Process updates concurrently across chats, in order within a chat.
+
+    The WSGI thread only enqueues work and returns; a daemon thread owns the
+    event loop. Each chat gets a FIFO drained by a single task, so updates from
+    one chat never overlap while different chats run in parallel (bounded by
+    `max_concurrency`). At most `max_pending` updates are held; beyond that
+    `submit` refuses and the caller should answer 503 so Telegram redelivers.
+    """
+
+    def __init__(self, max_pending: int = 500, max_concurrency: int = 32):
+        self.max_pending = max_pending
+        self.max_concurrency = max_concurrency
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.chat_queues = {}  # {chat_key: deque of (coroutine factory, submit time)}, loop thread only
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.in_flight = 0
+        self.stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'processed': 0,
+            'failed': 0,
+            'max_pending': 0
+        }
+
+    def start(self):
+        """Start the background event loop thread (idempotent)"""
+        if self.thread is not None:
+            return self
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name='update-dispatcher', daemon=True)
+        self.thread.start()
+        self.semaphore = self.run(self._make_semaphore())
+        if not hasattr(self, 'fork_hook'):
+            self.fork_hook = os.register_at_fork(after_in_child=self._after_fork)
+        logger.info(f"🧵 Update dispatcher started (queue {self.max_pending}, concurrency {self.max_concurrency})")
+        return self
+
+    def _after_fork(self):
+        # Pre-forking servers import the app once: the loop thread only exists in the parent
+        if self.thread is None:
+            return
+        self.lock = threading.Lock()
+        self.loop = self.thread = self.semaphore = None
+        self.chat_queues = {}
+        self.pending = self.in_flight = 0
+        self.start()
+
+    def bind(self, loop):
+        """Use an already running event loop instead of a thread (ASGI servers)"""
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        logger.info(f"🧵 Update dispatcher bound to server loop (queue {self.max_pending}, concurrency {self.max_concurrency})")
+        return self
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the dispatcher loop and wait for its result (STARTUP_WAIT_TIMEOUT at most by default)"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(Config.STARTUP_WAIT_TIMEOUT if timeout is None else timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def schedule(self, coro):
+        """Fire-and-forget a coroutine on the dispatcher loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def drain(self, timeout: float) -> int:
+        """Wait on the dispatcher loop until every queued update is processed; returns how many are left"""
+        deadline = time.perf_counter() + timeout
+        while self.pending and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        return self.pending
+
+    def submit(self, chat_key, factory) -> bool:
+        """Queue `factory()` (a coroutine function) behind earlier work for the same chat.
+
+        Thread-safe. Returns False when the queue is full.
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                return False
+            self.pending += 1
+            self.stats['accepted'] += 1
+            self.stats['max_pending'] = max(self.stats['max_pending'], self.pending)
+        self.loop.call_soon_threadsafe(self._enqueue, chat_key, factory, time.perf_counter())
+        return True
+
+    def _enqueue(self, chat_key, factory, submitted):
+        queue = self.chat_queues.get(chat_key)
+        if queue is None:
+            queue = self.chat_queues[chat_key] = deque()
+            self.loop.create_task(self._drain(chat_key, queue))
+        queue.append((factory, submitted))
+
+    async def _drain(self, chat_key, queue):
+        """Work through one chat's queue, then forget the chat"""
+        while queue:
+            factory, submitted = queue.popleft()
+            async with self.semaphore:
+                metrics.observe('queue_wait', time.perf_counter() - submitted)
+                self.in_flight += 1
+                try:
+                    with metrics.timer('dispatch'):
+                        await factory()
+                    self.stats['processed'] += 1
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logger.error(f"❌ Update processing failed for chat {chat_key}: {e}")
+                finally:
+                    self.in_flight -= 1
+                    with self.lock:
+                        self.pending -= 1
+        del self.chat_queues[chat_key]
+
+    def get_stats(self):
+        """Queue depth and backpressure counters"""
+        with self.lock:
+            pending = self.pending
+        return dict(
+            self.stats,
+            pending=pending,
+            capacity=self.max_pending,
+            in_flight=self.in_flight,
+            active_chats=len(self.chat_queues)
+        )
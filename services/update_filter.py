@@ -0,0 +1,64 @@
+"""
+Update Filter - discard irrelevant webhook updates from the raw JSON
+
+Most traffic in busy groups is chatter in chats where AI is off; those
+updates used to go through Update.de_json and handler dispatch only for
+handle_message to return. `should_process` looks at the parsed dict and
+drops group/channel messages that no handler would act on: messages without
+text, and non-command text while AI is disabled for the chat. Private
+chats, commands and other update types always pass.
+"""
+import json
+from config import Config
+from services.bot_service import BotService
+from services.metrics import metrics
+from services.storage import storage
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+# Update fields carrying a message, in the order Update.effective_message checks them
+_MESSAGE_FIELDS = ('message', 'edited_message', 'channel_post', 'edited_channel_post')
+
+
+def parse_update(body: bytes) -> dict:
+    """Decode a webhook body (orjson when installed)"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _ai_enabled(chat_id) -> bool:
+    if storage.shared:
+        # Another worker may have run /startAI since this one cached the flag
+        return bool(storage.load_ai_enabled(chat_id))
+    return BotService.is_ai_enabled(chat_id)
+
+
+def should_process(update_data: dict) -> bool:
+    """False for updates that would reach no handler (counted as webhook_filtered)"""
+    if not Config.WEBHOOK_PREFILTER:
+        return True
+    for field in _MESSAGE_FIELDS:
+        message = update_data.get(field)
+        if message is not None:
+            break
+    else:
+        return True
+
+    chat = message.get('chat') or {}
+    if chat.get('type') == 'private':
+        return True
+    text = message.get('text')
+    if text is None:
+        reason = 'no_text'  # handlers only take text messages and commands
+    elif text.startswith('/'):
+        return True
+    elif _ai_enabled(chat.get('id')):
+        return True
+    else:
+        reason = 'ai_disabled'
+    metrics.inc('webhook_filtered', reason)
+    return False
@@ -0,0 +1,170 @@
+"""
+User Activity - compact, bounded per-user request tracking
+
+One table replaces the dict-of-dicts in LoggerService and the unique-user set
+in BotService. Records use __slots__ and integer monotonic timestamps (one
+clock read per message), idle users are evicted from memory (their records
+stay in storage), and unique users can be counted with a fixed-size
+HyperLogLog sketch instead of an exact count.
+"""
+import base64
+import math
+import time
+from collections import OrderedDict
+from config import Config
+from services.storage import storage as default_storage
+
+# monotonic seconds -> unix time
+_WALL_OFFSET = time.time() - time.monotonic()
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(value: int) -> int:
+    """splitmix64 finalizer: spreads sequential integer ids over 64 bits"""
+    x = (hash(value) + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class HyperLogLog:
+    """Approximate distinct counter in 2**p bytes (p=12: 4 KB, ~1.6% error)"""
+
+    def __init__(self, p: int = 12, registers: bytes = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, value) -> bool:
+        """Add a value; returns True if the sketch changed"""
+        x = _hash64(value)
+        index = x >> (64 - self.p)
+        rest = (x << self.p) & _MASK64
+        rank = (64 - self.p + 1) if rest == 0 else (65 - rest.bit_length())
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def count(self) -> int:
+        estimate = self.alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # linear counting for small sets
+        return int(round(estimate))
+
+    def dumps(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode()
+
+
+class UserRecord:
+    __slots__ = ('username', 'requests', 'last_active')
+
+    def __init__(self, username, requests=0, last_active=0):
+        self.username = username
+        self.requests = requests
+        self.last_active = last_active  # int(time.monotonic())
+
+    @property
+    def last_active_at(self) -> float:
+        """Unix timestamp of the last request"""
+        return _WALL_OFFSET + self.last_active
+
+
+class ActivityTable:
+    """In-memory LRU of active users over persistent storage"""
+
+    def __init__(self, storage=None, max_users=None, idle_ttl=None, approximate=None):
+        self.storage = storage
+        self.max_users = max_users or Config.USER_ACTIVITY_MAX
+        self.idle_ttl = Config.USER_ACTIVITY_TTL if idle_ttl is None else idle_ttl
+        self.approximate = Config.UNIQUE_USERS_APPROX if approximate is None else approximate
+        self.users = OrderedDict()  # {user_id: UserRecord}, least recently active first
+        self.evicted = 0
+        self.hll = None
+        if self.approximate:
+            saved = storage.load_counter('unique_users_hll', None) if storage else None
+            self.hll = HyperLogLog(registers=base64.b64decode(saved) if saved else None)
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, user_id):
+        return user_id in self.users
+
+    def get(self, user_id):
+        return self.users.get(user_id)
+
+    def touch(self, user_id: int, username: str):
+        """Count one request for a user"""
+        now = int(time.monotonic())
+        record = self.users.get(user_id)
+        if record is None:
+            saved = self.storage.load_user(user_id) if self.storage else None
+            record = self.users[user_id] = UserRecord(username, saved['requests'] if saved else 0)
+        else:
+            self.users.move_to_end(user_id)
+        record.requests += 1
+        record.last_active = now
+        record.username = username  # Update in case it changed
+
+        if self.storage is not None and self.storage.shared:
+            self._touch_shared(user_id, record)
+        elif self.storage is not None:
+            self.storage.save_user(user_id, {
+                "username": username,
+                "requests": record.requests,
+                "last_active": int(record.last_active_at)
+            })
+        if self.hll is not None and self.hll.add(user_id) and self.storage is not None:
+            if self.storage.shared:
+                self._merge_hll()
+            else:
+                self.storage.save_counter('unique_users_hll', self.hll.dumps())
+        self._evict(now)
+        return record
+
+    def _touch_shared(self, user_id: int, record: UserRecord):
+        # Other workers count requests of the same user: increment the stored value
+        def count(saved):
+            return {
+                "username": record.username,
+                "requests": (saved['requests'] if saved else 0) + 1,
+                "last_active": int(record.last_active_at)
+            }
+
+        record.requests = self.storage.update('users', user_id, count)['requests']
+
+    def _merge_hll(self):
+        # Register-wise max keeps the users seen by every worker
+        def merge(saved):
+            registers = bytearray(base64.b64decode(saved)) if saved else bytearray(self.hll.m)
+            for index, rank in enumerate(self.hll.registers):
+                if rank > registers[index]:
+                    registers[index] = rank
+            return base64.b64encode(bytes(registers)).decode()
+
+        self.hll.registers = bytearray(base64.b64decode(self.storage.update('counters', 'unique_users_hll', merge)))
+
+    def _evict(self, now: int):
+        cutoff = now - self.idle_ttl if self.idle_ttl else None
+        while self.users:
+            user_id, record = next(iter(self.users.items()))
+            if len(self.users) <= self.max_users and (cutoff is None or record.last_active > cutoff):
+                break
+            del self.users[user_id]
+            self.evicted += 1
+
+    def unique_users(self) -> int:
+        """Distinct users ever seen (approximate when UNIQUE_USERS_APPROX is on)"""
+        if self.hll is not None:
+            return self.hll.count()
+        if self.storage is not None:
+            return self.storage.count_users()
+        return len(self.users)
+
+
+# Shared table used by LoggerService and BotService
+user_activity = ActivityTable(storage=default_storage)
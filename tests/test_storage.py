@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')  # keep the module singleton off the real database
+
+from services import storage as storage_module
+from services.storage import SQLiteStorage
+
+_dumps = json.dumps
+
+
+def slow_dumps(*args, **kwargs):
+    time.sleep(0.0005)  # widen the window between taking a batch and committing it
+    return _dumps(*args, **kwargs)
+
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'state.db')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_increments_survive_concurrent_flushes(self):
+        store = SQLiteStorage(self.path, flush_interval=3600)
+        stop = threading.Event()
+
+        def flush_loop():
+            while not stop.is_set():
+                store.flush()
+
+        flusher = threading.Thread(target=flush_loop)
+        with mock.patch.object(storage_module.json, 'dumps', slow_dumps):
+            flusher.start()
+            for _ in range(2000):
+                for name in ('a', 'b', 'c'):
+                    store.increment_counter(name)
+            stop.set()
+            flusher.join()
+        store.close()
+
+        reopened = SQLiteStorage(self.path, flush_interval=3600)
+        try:
+            for name in ('a', 'b', 'c'):
+                self.assertEqual(reopened.load_counter(name), 2000)
+        finally:
+            reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
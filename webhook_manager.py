@@ -5,13 +5,13 @@ This script helps you manage webhooks for your bot
 
 import asyncio
 import sys
-from telegram import Bot
 from config import Config
+from services.telegram_client import build_bot
 
 class WebhookManager:
     def __init__(self):
         Config.validate()
-        self.bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
+        self.bot = build_bot()
     
     async def get_webhook_info(self):
         """Get current webhook information"""